@@ -0,0 +1,94 @@
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import degrees
+
+# Pairs handed to a worker at a time
+CHUNKSIZE = 256
+
+
+def main():
+    args = sys.argv[1:]
+    workers = os.cpu_count() or 1
+    if "--workers" in args:
+        i = args.index("--workers")
+        try:
+            workers = int(args[i + 1])
+        except (IndexError, ValueError):
+            sys.exit("Usage: python batch.py directory [pairs] [--workers N]")
+        del args[i:i + 2]
+    if len(args) not in (1, 2):
+        sys.exit("Usage: python batch.py directory [pairs] [--workers N]")
+    directory = args[0]
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(directory, compact=True)
+    print("Data loaded.", file=sys.stderr)
+
+    pairs = open(args[1], encoding="utf-8") if len(args) == 2 else sys.stdin
+    start = time.perf_counter()
+    with pairs:
+        count = run(directory, pairs, sys.stdout, workers)
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"{count} queries in {elapsed:.2f}s ({rate:.0f} queries/s).", file=sys.stderr)
+
+
+def run(directory, lines, out, workers):
+    """
+    Answer every "source,target" line of person ids in `lines`, writing
+    one JSON object per line to `out` in input order.
+    Return the number of queries answered.
+    """
+    lines = (line for line in lines if line.strip())
+    count = 0
+    if workers <= 1:
+        for result in map(answer, lines):
+            out.write(result)
+            count += 1
+        return count
+
+    # Each worker memory-maps the graph snapshot the parent just wrote,
+    # so all processes share the same pages
+    with multiprocessing.Pool(workers, load, (directory,)) as pool:
+        for result in pool.imap(answer, lines, CHUNKSIZE):
+            out.write(result)
+            count += 1
+    return count
+
+
+def load(directory):
+    """
+    Load the graph in a worker process.
+    """
+    degrees.load_data(directory, compact=True)
+
+
+def answer(line):
+    """
+    Return the JSON line answering one "source,target" query.
+    """
+    fields = line.replace("\t", ",").split(",")
+    if len(fields) != 2:
+        return json.dumps({"query": line.strip(), "error": "malformed query"}) + "\n"
+    source, target = fields[0].strip(), fields[1].strip()
+    if degrees.graph.person_index(source) is None:
+        error = f"unknown person {source}"
+    elif degrees.graph.person_index(target) is None:
+        error = f"unknown person {target}"
+    else:
+        path = degrees.bidirectional_shortest_path(source, target)
+        return json.dumps({
+            "source": source,
+            "target": target,
+            "degrees": None if path is None else len(path),
+            "path": path,
+        }) + "\n"
+    return json.dumps({"source": source, "target": target, "error": error}) + "\n"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import time
+
+import degrees
+from landmarks import LANDMARKS, build_landmarks, write_landmarks
+from snapshot import SNAPSHOT, fingerprint, load_graph_cached
+
+USAGE = """Usage:
+  python benchmark.py generate directory stars [seed] [window]
+  python benchmark.py run directory [queries] [output.json]"""
+
+# Backends timed by `run`, each in a fresh process, and the number of
+# landmarks built for the last one
+BACKENDS = ("dict", "compact", "snapshot", "landmarks")
+LANDMARK_COUNT = 16
+
+# Shape of the synthetic data: people and movies per star row, and the
+# Pareto exponents of cast sizes and of how often each person is cast
+PEOPLE_PER_STAR = 0.3
+MOVIES_PER_STAR = 0.1
+CAST_SHAPE = 1.5
+POPULARITY_SHAPE = 1.2
+
+SYLLABLES = ["ka", "ren", "to", "mi", "sa", "lo", "vin", "da", "el", "mar",
+             "co", "ta", "ri", "jo", "an", "ne", "bel", "son", "ha", "us"]
+
+
+def main():
+    if len(sys.argv) >= 4 and sys.argv[1] == "generate":
+        seed = int(sys.argv[4]) if len(sys.argv) >= 5 else 0
+        window = int(sys.argv[5]) if len(sys.argv) == 6 else None
+        counts = generate(sys.argv[2], int(float(sys.argv[3])), seed, window)
+        print(json.dumps(counts))
+    elif len(sys.argv) >= 3 and sys.argv[1] == "run":
+        queries = int(sys.argv[3]) if len(sys.argv) >= 4 else 1000
+        results = run(sys.argv[2], queries)
+        text = json.dumps(results, indent=2)
+        if len(sys.argv) == 5:
+            with open(sys.argv[4], "w") as f:
+                f.write(text + "\n")
+        print(text)
+    else:
+        sys.exit(USAGE)
+
+
+def random_name(rng):
+    first = "".join(rng.choices(SYLLABLES, k=rng.randint(1, 3))).title()
+    last = "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))).title()
+    return f"{first} {last}"
+
+
+def generate(directory, stars, seed=0, window=None):
+    """
+    Write synthetic people.csv, movies.csv and stars.csv files with
+    about `stars` star rows to `directory`.
+
+    Cast sizes follow a Pareto distribution, and cast members are drawn
+    with Pareto-distributed popularity, so a few people appear in very
+    many movies the way hub actors do in the IMDB data.
+
+    With a `window`, each movie's cast is instead drawn from people whose
+    ids are within `window` of a point that moves along the people with
+    the movie id, which gives a graph with long shortest paths, where
+    landmark pruning pays off.
+    Return the number of rows written to each file.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    n_people = max(int(stars * PEOPLE_PER_STAR), 2)
+    n_movies = max(int(stars * MOVIES_PER_STAR), 1)
+
+    with open(f"{directory}/people.csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(n_people):
+            writer.writerow([i + 1, random_name(rng), rng.randint(1900, 2005)])
+
+    with open(f"{directory}/movies.csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for i in range(n_movies):
+            title = " ".join(rng.choices(SYLLABLES, k=3)).title()
+            writer.writerow([i + 1, title, rng.randint(1920, 2023)])
+
+    # Cumulative popularity weights for drawing cast members
+    weights = []
+    total = 0.0
+    for _ in range(n_people):
+        total += rng.paretovariate(POPULARITY_SHAPE)
+        weights.append(total)
+
+    written = 0
+    with open(f"{directory}/stars.csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        movie = 0
+        while written < stars:
+            size = min(int(rng.paretovariate(CAST_SHAPE)), n_people, stars - written)
+            if window is None:
+                cast = set(rng.choices(range(n_people), cum_weights=weights, k=size))
+            else:
+                center = movie % n_movies * n_people // n_movies
+                cast = set(
+                    min(max(center + rng.randint(-window, window), 0), n_people - 1)
+                    for _ in range(size)
+                )
+            for person in cast:
+                writer.writerow([person + 1, movie % n_movies + 1])
+            written += len(cast)
+            movie += 1
+    return {"people": n_people, "movies": n_movies, "stars": written}
+
+
+def run(directory, queries, seed=0):
+    """
+    Time loading and querying `directory` with every backend, each in
+    its own process so peak memory is measured separately.
+    Return the results as a JSON-serializable dictionary.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for backend in BACKENDS:
+        if backend == "landmarks":
+            # Built beforehand so it counts towards neither the load time
+            # nor the peak memory
+            with context.Pool(1) as pool:
+                pool.apply(prepare_landmarks, (directory,))
+        with context.Pool(1) as pool:
+            results.append(pool.apply(measure, (directory, backend, queries, seed)))
+    return {
+        "benchmark": "degrees",
+        "directory": directory,
+        "python": platform.python_version(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def prepare_landmarks(directory):
+    """
+    Build the landmark index that the "landmarks" backend loads.
+    """
+    index = build_landmarks(load_graph_cached(directory), LANDMARK_COUNT)
+    write_landmarks(index, os.path.join(directory, LANDMARKS), fingerprint(directory))
+
+
+def measure(directory, backend, queries, seed):
+    """
+    Load `directory` with `backend` and answer `queries` random pairs.
+    """
+    # "compact" parses the CSV files and writes a fresh snapshot, which
+    # "snapshot" (run after it) then only has to memory-map
+    if backend == "compact":
+        path = os.path.join(directory, SNAPSHOT)
+        if os.path.exists(path):
+            os.remove(path)
+
+    start = time.perf_counter()
+    stats = degrees.load_data(directory, compact=backend != "dict")
+    load_seconds = time.perf_counter() - start
+    if backend in ("compact", "snapshot"):
+        # Left over from an earlier run
+        degrees.graph.landmarks = None
+
+    if degrees.graph is not None:
+        person_ids = degrees.graph.person_ids
+    else:
+        # Same order as the graph's ids, so every backend gets the same pairs
+        person_ids = sorted(degrees.people)
+    rng = random.Random(seed)
+    latencies = []
+    lengths = []
+    for _ in range(queries):
+        source = person_ids[rng.randrange(len(person_ids))]
+        target = person_ids[rng.randrange(len(person_ids))]
+        start = time.perf_counter()
+        path = degrees.bidirectional_shortest_path(source, target)
+        latencies.append(time.perf_counter() - start)
+        if path is not None:
+            lengths.append(len(path))
+    latencies.sort()
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+    return {
+        "backend": backend,
+        "rows": stats,
+        "load_seconds": load_seconds,
+        "peak_rss_mb": peak_mb,
+        "queries": queries,
+        "connected": len(lengths),
+        "mean_degrees": sum(lengths) / len(lengths) if lengths else None,
+        "latency_ms": {
+            name: percentile(latencies, q) * 1000
+            for name, q in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))
+        },
+    }
+
+
+def percentile(values, q):
+    """
+    Return the `q`th percentile of sorted `values` (nearest rank).
+    """
+    if not values:
+        return 0.0
+    rank = max(int(round(q / 100 * len(values))) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+if __name__ == "__main__":
+    main()
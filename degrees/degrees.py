@@ -1,7 +1,15 @@
-import csv
+import itertools
+import os
 import sys
 
-from util import Node, StackFrontier, QueueFrontier
+from landmarks import LANDMARKS, open_landmarks
+from loader import read_chunks, read_tables
+from nameindex import NameIndex, normalize
+from snapshot import fingerprint, load_graph_cached
+from util import (
+    Node, StackFrontier, QueueFrontier, bidirectional_search,
+    enumerate_paths, shortest_path_dag,
+)
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,54 +20,169 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Compact integer-indexed graph used instead of the dicts above
+# when data is loaded with `compact=True`, memory-mapped from a
+# snapshot of the CSV files where possible, along with the landmark
+# index built by landmarks.py if it is up to date
+graph = None
 
-def load_data(directory):
+# Prefix and fuzzy name index, built on first use
+name_index = None
+
+
+def load_data(directory, compact=False):
     """
     Load data from CSV files into memory.
+
+    Returns a dictionary counting the people, movies and star rows read,
+    along with malformed rows and star rows dropped as dangling (unknown
+    person or movie) or duplicate.
     """
+    if compact:
+        global graph
+        graph = load_graph_cached(directory)
+        path = os.path.join(directory, LANDMARKS)
+        if os.path.exists(path):
+            graph.landmarks = open_landmarks(path, fingerprint(directory))
+        return graph.stats
+
+    people_rows, movie_rows, star_chunks, stats = read_tables(directory)
+
     # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
+    for person_id, name, birth in people_rows:
+        people[person_id] = {
+            "name": name,
+            "birth": birth,
+            "movies": set()
+        }
+        if name.lower() not in names:
+            names[name.lower()] = {person_id}
+        else:
+            names[name.lower()].add(person_id)
 
     # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
-
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    for movie_id, title, year in movie_rows:
+        movies[movie_id] = {
+            "title": title,
+            "year": year,
+            "stars": set()
+        }
+
+    # Load stars, streamed in chunks while stars.csv is still being read
+    for chunk in star_chunks:
+        for person_id, movie_id in chunk:
+            person = people.get(person_id)
+            movie = movies.get(movie_id)
+            if person is None or movie is None:
+                stats["dangling"] += 1
+            elif movie_id in person["movies"]:
+                stats["duplicate"] += 1
+            else:
+                person["movies"].add(movie_id)
+                movie["stars"].add(person_id)
+    return stats
+
+
+def add_person(person_id, name, birth):
+    """
+    Add a person to the loaded data.
+    Returns False if the person is already loaded.
+    """
+    if graph is not None:
+        if not graph.add_person(person_id, name, birth):
+            return False
+    else:
+        if person_id in people:
+            return False
+        people[person_id] = {"name": name, "birth": birth, "movies": set()}
+        names.setdefault(name.lower(), set()).add(person_id)
+    if name_index is not None:
+        name_index.add(person_id, name)
+    return True
+
+
+def add_movie(movie_id, title, year):
+    """
+    Add a movie to the loaded data.
+    Returns False if the movie is already loaded.
+    """
+    if graph is not None:
+        return graph.add_movie(movie_id, title, year)
+    if movie_id in movies:
+        return False
+    movies[movie_id] = {"title": title, "year": year, "stars": set()}
+    return True
+
+
+def add_star(person_id, movie_id):
+    """
+    Record that a person starred in a movie.
+    Returns False if the person or movie is unknown,
+    or the star is already loaded.
+    """
+    if graph is not None:
+        return graph.add_star(person_id, movie_id)
+    person = people.get(person_id)
+    movie = movies.get(movie_id)
+    if person is None or movie is None or movie_id in person["movies"]:
+        return False
+    person["movies"].add(movie_id)
+    movie["stars"].add(person_id)
+    return True
+
+
+def apply_delta(directory):
+    """
+    Add the rows of whichever of people.csv, movies.csv and stars.csv
+    exist in `directory` to the loaded data, in that order.
+
+    Returns a dictionary counting the rows added, along with malformed
+    rows and rows skipped as already loaded or, for stars, dangling.
+    """
+    stats = {"people": 0, "movies": 0, "stars": 0, "malformed": 0,
+             "dangling": 0, "duplicate": 0}
+    files = [
+        ("people", ("id", "name", "birth"), add_person),
+        ("movies", ("id", "title", "year"), add_movie),
+        ("stars", ("person_id", "movie_id"), add_star),
+    ]
+    for table, columns, add in files:
+        filename = f"{directory}/{table}.csv"
+        if not os.path.exists(filename):
+            continue
+        for chunk in read_chunks(filename, columns, stats):
+            for row in chunk:
+                if add(*row):
+                    stats[table] += 1
+                elif table == "stars" and not known_star(*row):
+                    stats["dangling"] += 1
+                else:
+                    stats["duplicate"] += 1
+    return stats
+
+
+def known_star(person_id, movie_id):
+    """
+    Returns whether both the person and movie of a star row are loaded.
+    """
+    if graph is not None:
+        return (graph.person_index(person_id) is not None
+                and graph.movie_index(movie_id) is not None)
+    return person_id in people and movie_id in movies
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    args = sys.argv[1:]
+    compact = "--compact" in args
+    if compact:
+        args.remove("--compact")
+    if len(args) > 1:
+        sys.exit("Usage: python degrees.py [--compact] [directory]")
+    directory = args[0] if len(args) == 1 else "large"
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(directory, compact)
     print("Data loaded.")
 
     source = person_id_for_name(input("Name: "))
@@ -70,7 +193,7 @@ def main():
         sys.exit("Person not found.")
     # print(source)
     # print(target)
-    path = shortest_path(source, target)
+    path = bidirectional_shortest_path(source, target)
 
     if path is None:
         print("Not connected.")
@@ -79,9 +202,9 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = person_for_id(path[i][1])["name"]
+            person2 = person_for_id(path[i + 1][1])["name"]
+            movie = movie_for_id(path[i + 1][0])["title"]
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
@@ -92,6 +215,8 @@ def shortest_path(source, target):
 
     If no possible path, returns None.
     """
+    if graph is not None:
+        return graph.shortest_path(source, target)
     # TODO
     ans = []
     if source == target:
@@ -121,30 +246,128 @@ def shortest_path(source, target):
     # raise NotImplementedError
 
 
+def bidirectional_shortest_path(source, target):
+    """
+    Same result format as `shortest_path`, but grows one BFS frontier
+    from `source` and one from `target` and stops as soon as the two
+    searches meet.
+
+    If no possible path, returns None.
+    """
+    if graph is not None:
+        return graph.shortest_path(source, target)
+    return bidirectional_search(source, target, neighbors_for_person)
+
+
+def all_shortest_paths(source, target, key=None):
+    """
+    Lazily yields every shortest list of (movie_id, person_id) pairs
+    that connects the source to the target, without materializing them.
+
+    If given, `key(movie_id, person_id)` is a tie-breaker such as
+    `most_recent_movie` or `most_popular_costar`: at each step back from
+    the target, the movie and co-star with the smallest key come first.
+    """
+    if graph is None:
+        parents = shortest_path_dag(source, target, neighbors_for_person)
+        if parents is not None:
+            yield from enumerate_paths(parents, source, target, key)
+        return
+
+    s = graph.person_index(source)
+    t = graph.person_index(target)
+    if s is None or t is None:
+        return
+    parents = shortest_path_dag(s, t, graph.expand)
+    if parents is None:
+        return
+    int_key = None
+    if key is not None:
+        def int_key(m, p):
+            return key(graph.movie_ids[m], graph.person_ids[p])
+    for path in enumerate_paths(parents, s, t, int_key):
+        yield [(graph.movie_ids[m], graph.person_ids[p]) for m, p in path]
+
+
+def top_shortest_paths(source, target, k, key=None):
+    """
+    Returns up to `k` shortest paths, ordered by the tie-breaker `key`.
+    """
+    return list(itertools.islice(all_shortest_paths(source, target, key), k))
+
+
+def most_recent_movie(movie_id, person_id):
+    """
+    Tie-breaker preferring the most recent movie.
+    """
+    year = movie_for_id(movie_id)["year"]
+    return -int(year) if year.isdigit() else 0
+
+
+def most_popular_costar(movie_id, person_id):
+    """
+    Tie-breaker preferring the co-star who appeared in the most movies.
+    """
+    if graph is not None:
+        return -len(graph.movies_of(graph.person_index(person_id)))
+    return -len(people[person_id]["movies"])
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    If nobody has exactly that name, the closest names
+    are offered to choose from instead.
     """
-    person_ids = list(names.get(name.lower(), set()))
-    if len(person_ids) == 0:
+    if not normalize(name):
+        # A blank name would be a prefix of everyone's
         return None
+    if graph is not None:
+        person_ids = graph.person_ids_for_name(name)
+    else:
+        person_ids = list(names.get(name.lower(), set()))
+    if len(person_ids) == 1:
+        return person_ids[0]
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
-        for person_id in person_ids:
-            person = people[person_id]
-            name = person["name"]
-            birth = person["birth"]
-            print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
-        try:
-            person_id = input("Intended Person ID: ")
-            if person_id in person_ids:
-                return person_id
-        except ValueError:
-            pass
-        return None
     else:
-        return person_ids[0]
+        person_ids = [
+            person_id for person_id, _, _ in get_name_index().search(name)
+        ]
+        if len(person_ids) == 0:
+            return None
+        print(f"No exact match for '{name}'. Did you mean:")
+    for person_id in person_ids:
+        person = person_for_id(person_id)
+        name = person["name"]
+        birth = person["birth"]
+        print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
+    try:
+        person_id = input("Intended Person ID: ")
+        if person_id in person_ids:
+            return person_id
+    except ValueError:
+        pass
+    return None
+
+
+def get_name_index():
+    """
+    Returns the name index over everyone loaded, building it
+    the first time it is needed.
+    """
+    global name_index
+    if name_index is None:
+        if graph is not None:
+            name_index = NameIndex(graph.person_ids, graph.person_names)
+        else:
+            person_ids = list(people)
+            name_index = NameIndex(
+                person_ids, [people[person_id]["name"] for person_id in person_ids]
+            )
+    return name_index
 
 
 def neighbors_for_person(person_id):
@@ -152,6 +375,8 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return graph.neighbors_for_person(person_id)
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -160,5 +385,23 @@ def neighbors_for_person(person_id):
     return neighbors
 
 
+def person_for_id(person_id):
+    """
+    Returns a dictionary with the name and birth of a person.
+    """
+    if graph is not None:
+        return graph.person(person_id)
+    return people[person_id]
+
+
+def movie_for_id(movie_id):
+    """
+    Returns a dictionary with the title and year of a movie.
+    """
+    if graph is not None:
+        return graph.movie(movie_id)
+    return movies[movie_id]
+
+
 if __name__ == "__main__":
     main()
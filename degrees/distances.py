@@ -0,0 +1,106 @@
+import sys
+from array import array
+from collections import Counter
+
+from snapshot import load_graph_cached
+
+# Distance of people that cannot be reached from the source
+UNREACHABLE = -1
+
+
+def main():
+    if len(sys.argv) != 4:
+        sys.exit("Usage: python distances.py directory person_id output")
+    directory, person_id, output = sys.argv[1:]
+    graph = load_graph_cached(directory)
+    source = graph.person_index(person_id)
+    if source is None:
+        sys.exit("Person not found.")
+
+    distance, parent_person, parent_movie = single_source(graph, source)
+    write_arrays(output, distance=distance, parent_person=parent_person,
+                 parent_movie=parent_movie)
+    print(f"Distances from {graph.person_names[source]}:")
+    for depth, count in sorted(histogram(distance).items()):
+        label = "unreachable" if depth == UNREACHABLE else depth
+        print(f"  {label}: {count}")
+    sizes = component_sizes(graph)
+    print(f"{len(sizes)} connected components, largest has {sizes[0]} people.")
+
+
+def single_source(graph, source):
+    """
+    Breadth-first search from person index `source` over the whole graph.
+
+    Return three arrays indexed by person: the distance from source
+    (UNREACHABLE if not connected), and the person and movie each person
+    was reached through (-1 for the source and unreachable people).
+    Following parents back from any person gives a shortest path.
+    """
+    n = len(graph.person_ids)
+    distance = array("i", [UNREACHABLE]) * n
+    parent_person = array("i", [-1]) * n
+    parent_movie = array("i", [-1]) * n
+    distance[source] = 0
+    layer = array("i", [source])
+    depth = 0
+    while layer:
+        depth += 1
+        next_layer = array("i")
+        for u in layer:
+            for m, v in graph.expand(u):
+                if distance[v] == UNREACHABLE:
+                    distance[v] = depth
+                    parent_person[v] = u
+                    parent_movie[v] = m
+                    next_layer.append(v)
+        layer = next_layer
+    return distance, parent_person, parent_movie
+
+
+def histogram(distance):
+    """
+    Return a Counter mapping each degree of separation to the number
+    of people at that distance.
+    """
+    return Counter(distance)
+
+
+def component_sizes(graph):
+    """
+    Return the sizes of the connected components of people,
+    largest first.
+    """
+    n = len(graph.person_ids)
+    seen = array("b", bytes(n))
+    sizes = []
+    for start in range(n):
+        if seen[start]:
+            continue
+        seen[start] = 1
+        size = 0
+        stack = array("i", [start])
+        while stack:
+            u = stack.pop()
+            size += 1
+            for _, v in graph.expand(u):
+                if not seen[v]:
+                    seen[v] = 1
+                    stack.append(v)
+        sizes.append(size)
+    sizes.sort(reverse=True)
+    return sizes
+
+
+def write_arrays(prefix, **arrays):
+    """
+    Write each array to `{prefix}.{name}.i32` as raw native-endian
+    32-bit ints, readable with `array.fromfile` or `numpy.fromfile`.
+    """
+    for name, values in arrays.items():
+        with open(f"{prefix}.{name}.i32", "wb") as f:
+            values.tofile(f)
+
+
+if __name__ == "__main__":
+    main()
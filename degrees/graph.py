@@ -0,0 +1,432 @@
+import bisect
+import math
+from array import array
+from collections import OrderedDict
+
+from loader import read_tables
+from util import bidirectional_search
+
+
+class StringTable():
+    """
+    Sequence of strings packed into one UTF-8 blob, where string `i` is
+    the byte range `offsets[i]:offsets[i + 1]`. Strings appended later
+    are kept in a plain list after the packed ones.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+        self.extra = []
+
+    @classmethod
+    def from_strings(cls, strings):
+        offsets = array("q", [0])
+        parts = []
+        position = 0
+        for s in strings:
+            encoded = s.encode("utf-8")
+            parts.append(encoded)
+            position += len(encoded)
+            offsets.append(position)
+        return cls(offsets, b"".join(parts))
+
+    def __len__(self):
+        return len(self.offsets) - 1 + len(self.extra)
+
+    def __getitem__(self, i):
+        packed = len(self.offsets) - 1
+        if i >= packed:
+            return self.extra[i - packed]
+        if i < 0:
+            raise IndexError("string table index out of range")
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def append(self, s):
+        self.extra.append(s)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class Graph():
+    """
+    Compact movie/star graph.
+
+    People and movies are interned to dense ints in sorted id order, so
+    an IMDB id is mapped back to its index with a bisect. The bipartite
+    person-movie graph is stored twice in CSR form: the movies of person
+    `p` are `person_movies[person_offsets[p]:person_offsets[p + 1]]` and
+    the stars of movie `m` are `movie_stars[movie_offsets[m]:...]`.
+
+    Setting `projection` to a `Projection` makes searches expand people
+    through its precomputed co-star adjacency instead, and setting
+    `landmarks` to a `landmarks.LandmarkIndex` lets them skip people
+    whose distance bounds rule them out.
+
+    People, movies and stars added after loading (see `add_person`,
+    `add_movie` and `add_star`) live in small overlay dictionaries on
+    top of the CSR arrays, with new people and movies numbered after
+    the loaded ones.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_stars,
+                 name_order):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+        # Person indices sorted by lowercase name
+        self.name_order = name_order
+        self.projection = None
+        self.landmarks = None
+        # Row counts from loading the CSV files, if parsed in this process
+        self.stats = None
+        # Overlay of updates: ids and lowercase names of added people
+        # and movies, and added movies per person and stars per movie
+        self.added_people = {}
+        self.added_movies = {}
+        self.added_names = {}
+        self.extra_movies = {}
+        self.extra_stars = {}
+
+    def person_index(self, person_id):
+        """
+        Return the dense index of `person_id`, or None if unknown.
+        """
+        n = len(self.person_offsets) - 1
+        i = bisect.bisect_left(self.person_ids, person_id, 0, n)
+        if i < n and self.person_ids[i] == person_id:
+            return i
+        return self.added_people.get(person_id)
+
+    def movie_index(self, movie_id):
+        """
+        Return the dense index of `movie_id`, or None if unknown.
+        """
+        n = len(self.movie_offsets) - 1
+        i = bisect.bisect_left(self.movie_ids, movie_id, 0, n)
+        if i < n and self.movie_ids[i] == movie_id:
+            return i
+        return self.added_movies.get(movie_id)
+
+    def movies_of(self, p):
+        if p < len(self.person_offsets) - 1:
+            movies = self.person_movies[self.person_offsets[p]:self.person_offsets[p + 1]]
+        else:
+            movies = ()
+        extra = self.extra_movies.get(p)
+        return list(movies) + extra if extra else movies
+
+    def stars_of(self, m):
+        if m < len(self.movie_offsets) - 1:
+            stars = self.movie_stars[self.movie_offsets[m]:self.movie_offsets[m + 1]]
+        else:
+            stars = ()
+        extra = self.extra_stars.get(m)
+        return list(stars) + extra if extra else stars
+
+    def neighbors(self, p):
+        """
+        Return (movie index, person index) pairs for everyone who
+        starred in a movie with person index `p`.
+        """
+        if self.extra_movies or self.extra_stars:
+            return [(m, q) for m in self.movies_of(p) for q in self.stars_of(m)]
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+        if p >= len(person_offsets) - 1:
+            # Added since the graph was built, and in no movie yet
+            return []
+        pairs = []
+        for k in range(person_offsets[p], person_offsets[p + 1]):
+            m = person_movies[k]
+            for j in range(movie_offsets[m], movie_offsets[m + 1]):
+                pairs.append((m, movie_stars[j]))
+        return pairs
+
+    def expand(self, p):
+        """
+        Return the (movie index, person index) pairs a search should
+        follow from person index `p`, using the projection if one is set.
+        """
+        if self.projection is not None:
+            return self.projection.neighbors(p)
+        return self.neighbors(p)
+
+    def neighbors_for_person(self, person_id):
+        """
+        Same as `neighbors`, but takes and returns IMDB ids.
+        """
+        p = self.person_index(person_id)
+        return set(
+            (self.movie_ids[m], self.person_ids[q])
+            for m, q in self.neighbors(p)
+        )
+
+    def person_ids_for_name(self, name):
+        """
+        Return the ids of every person whose name matches `name`,
+        ignoring case.
+        """
+        key = name.lower()
+        names = self.person_names
+
+        def lowered(i):
+            return names[i].lower()
+
+        lo = bisect.bisect_left(self.name_order, key, key=lowered)
+        hi = bisect.bisect_right(self.name_order, key, lo=lo, key=lowered)
+        person_ids = [self.person_ids[self.name_order[i]] for i in range(lo, hi)]
+        return person_ids + self.added_names.get(key, [])
+
+    def person(self, person_id):
+        """
+        Return a dictionary of name and birth for `person_id`.
+        """
+        p = self.person_index(person_id)
+        return {"name": self.person_names[p], "birth": self.person_births[p]}
+
+    def movie(self, movie_id):
+        """
+        Return a dictionary of title and year for `movie_id`.
+        """
+        m = self.movie_index(movie_id)
+        return {"title": self.movie_titles[m], "year": self.movie_years[m]}
+
+    def add_person(self, person_id, name, birth):
+        """
+        Add a person to the graph.
+        Return False if `person_id` is already known.
+        """
+        if self.person_index(person_id) is not None:
+            return False
+        self.added_people[person_id] = len(self.person_ids)
+        self.person_ids.append(person_id)
+        self.person_names.append(name)
+        self.person_births.append(birth)
+        self.added_names.setdefault(name.lower(), []).append(person_id)
+        return True
+
+    def add_movie(self, movie_id, title, year):
+        """
+        Add a movie to the graph.
+        Return False if `movie_id` is already known.
+        """
+        if self.movie_index(movie_id) is not None:
+            return False
+        self.added_movies[movie_id] = len(self.movie_ids)
+        self.movie_ids.append(movie_id)
+        self.movie_titles.append(title)
+        self.movie_years.append(year)
+        return True
+
+    def add_star(self, person_id, movie_id):
+        """
+        Record that a person starred in a movie, invalidating the
+        projected adjacency of everyone in that movie and the landmark
+        index, whose distances may now be too long.
+        Return False if either id is unknown or the star already exists.
+        """
+        p = self.person_index(person_id)
+        m = self.movie_index(movie_id)
+        if p is None or m is None or m in self.movies_of(p):
+            return False
+        if self.projection is not None:
+            self.projection.invalidate(self.stars_of(m))
+            self.projection.invalidate([p])
+        self.landmarks = None
+        self.extra_movies.setdefault(p, []).append(m)
+        self.extra_stars.setdefault(m, []).append(p)
+        return True
+
+    def has_updates(self):
+        return bool(self.added_people or self.added_movies or self.extra_movies)
+
+    def shortest_path(self, source, target):
+        """
+        Return the shortest list of (movie_id, person_id) pairs that
+        connect person ids `source` and `target`, or None.
+        """
+        s = self.person_index(source)
+        t = self.person_index(target)
+        if s is None or t is None:
+            return None
+        prune = None
+        if self.landmarks is not None:
+            lower, upper = self.landmarks.bounds(s, t)
+            if lower == math.inf:
+                return None
+            prune = self.landmarks.pruner(s, t, upper)
+        path = bidirectional_search(s, t, self.expand, prune)
+        if path is None:
+            return None
+        return [(self.movie_ids[m], self.person_ids[p]) for m, p in path]
+
+
+class Projection():
+    """
+    Person-level projection of a `Graph`: for each person, every co-star
+    together with one witness movie they share (the lowest movie index).
+
+    Built eagerly with `Projection.build`, the adjacency is stored in CSR
+    form. Otherwise it is computed on demand and the `maxsize` most
+    recently used people are kept in an LRU cache (unbounded if None).
+    People whose co-stars changed after a build are projected on demand.
+    """
+
+    def __init__(self, graph, maxsize=None):
+        self.graph = graph
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.offsets = None
+        self.costars = None
+        self.witnesses = None
+        self.stale = set()
+
+    @classmethod
+    def build(cls, graph):
+        projection = cls(graph)
+        offsets = array("q", [0])
+        costars = array("i")
+        witnesses = array("i")
+        for p in range(len(graph.person_ids)):
+            pairs = projection.project(p)
+            costars.extend(q for _, q in pairs)
+            witnesses.extend(m for m, _ in pairs)
+            offsets.append(len(costars))
+        projection.offsets = offsets
+        projection.costars = costars
+        projection.witnesses = witnesses
+        return projection
+
+    def project(self, p):
+        """
+        Return (witness movie, co-star) pairs for person index `p`,
+        sorted by co-star.
+        """
+        witness = {}
+        for m, q in self.graph.neighbors(p):
+            if q != p and (q not in witness or m < witness[q]):
+                witness[q] = m
+        return [(witness[q], q) for q in sorted(witness)]
+
+    def neighbors(self, p):
+        """
+        Return (movie index, person index) pairs for the co-stars of `p`.
+        """
+        if self.offsets is not None and p < len(self.offsets) - 1 and p not in self.stale:
+            start = self.offsets[p]
+            end = self.offsets[p + 1]
+            return zip(self.witnesses[start:end], self.costars[start:end])
+        pairs = self.cache.get(p)
+        if pairs is not None:
+            self.cache.move_to_end(p)
+            return pairs
+        pairs = self.project(p)
+        self.cache[p] = pairs
+        if self.maxsize is not None and len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+        return pairs
+
+    def invalidate(self, people):
+        """
+        Forget the projection of each person index in `people`.
+        """
+        for p in people:
+            self.cache.pop(p, None)
+            if self.offsets is not None:
+                self.stale.add(p)
+
+
+def build_csr(rows, cols, n):
+    """
+    Group the (rows[k], cols[k]) pairs by row into CSR form over `n`
+    rows, sorting each row and dropping duplicate entries.
+    Return (offsets, values, number of duplicates dropped).
+    """
+    counts = array("q", bytes(8 * (n + 1)))
+    for r in rows:
+        counts[r + 1] += 1
+    for r in range(n):
+        counts[r + 1] += counts[r]
+    values = array("i", bytes(4 * len(cols)))
+    position = array("q", counts[:-1])
+    for r, c in zip(rows, cols):
+        values[position[r]] = c
+        position[r] += 1
+
+    # Sort and deduplicate each row in place, compacting as we go
+    offsets = array("q", [0])
+    write = 0
+    for r in range(n):
+        row = sorted(set(values[counts[r]:counts[r + 1]]))
+        values[write:write + len(row)] = array("i", row)
+        write += len(row)
+        offsets.append(write)
+    duplicates = len(values) - write
+    del values[write:]
+    return offsets, values, duplicates
+
+
+def load_graph(directory):
+    """
+    Load the people, movies and stars CSV files in `directory`
+    into a compact `Graph`.
+    """
+    people, movies, star_chunks, stats = read_tables(directory)
+    people.sort()
+    movies.sort()
+    person_index = {row[0]: i for i, row in enumerate(people)}
+    movie_index = {row[0]: i for i, row in enumerate(movies)}
+
+    # Stars referring to unknown people or movies are dropped
+    star_people = array("i")
+    star_movies = array("i")
+    for chunk in star_chunks:
+        for person_id, movie_id in chunk:
+            p = person_index.get(person_id)
+            m = movie_index.get(movie_id)
+            if p is None or m is None:
+                stats["dangling"] += 1
+                continue
+            star_people.append(p)
+            star_movies.append(m)
+    del person_index, movie_index
+
+    person_offsets, person_movies, stats["duplicate"] = build_csr(
+        star_people, star_movies, len(people)
+    )
+    del star_people, star_movies
+    movie_rows = array("i")
+    for p in range(len(people)):
+        movie_rows.extend([p] * (person_offsets[p + 1] - person_offsets[p]))
+    movie_offsets, movie_stars, _ = build_csr(person_movies, movie_rows, len(movies))
+    del movie_rows
+
+    name_order = array("i", sorted(
+        range(len(people)), key=lambda i: people[i][1].lower()
+    ))
+    graph = Graph(
+        StringTable.from_strings(row[0] for row in people),
+        StringTable.from_strings(row[1] for row in people),
+        StringTable.from_strings(row[2] for row in people),
+        StringTable.from_strings(row[0] for row in movies),
+        StringTable.from_strings(row[1] for row in movies),
+        StringTable.from_strings(row[2] for row in movies),
+        person_offsets, person_movies, movie_offsets, movie_stars,
+        name_order,
+    )
+    graph.stats = stats
+    return graph
@@ -0,0 +1,234 @@
+import json
+import math
+import mmap
+import os
+import sys
+from array import array
+
+from distances import UNREACHABLE, single_source
+from snapshot import fingerprint, load_graph_cached
+
+# File written next to the CSV files by `python landmarks.py`
+LANDMARKS = "landmarks.bin"
+
+MAGIC = b"DEGLMK01"
+
+# Stored distances are one byte each; these mark missing values
+UNKNOWN = 255
+CAP = 254
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python landmarks.py directory k")
+    directory = sys.argv[1]
+    graph = load_graph_cached(directory)
+    index = build_landmarks(graph, int(sys.argv[2]))
+    path = os.path.join(directory, LANDMARKS)
+    write_landmarks(index, path, fingerprint(directory))
+    names = ", ".join(graph.person_names[p] for p in index.landmarks)
+    print(f"Wrote {path} with landmarks {names}.")
+
+
+class LandmarkIndex():
+    """
+    BFS distances from K landmark people to everyone, one byte each.
+    Row `k` of `distances` holds the distances from `landmarks[k]`, with
+    UNKNOWN for people it cannot reach. Distances of CAP or more are
+    stored as CAP and give no bound.
+
+    By the triangle inequality, for any landmark l,
+        |d(l, a) - d(l, b)| <= d(a, b) <= d(l, a) + d(l, b)
+    and if l reaches exactly one of a and b they are not connected.
+    """
+
+    def __init__(self, landmarks, distances):
+        self.landmarks = landmarks
+        self.n = len(distances) // len(landmarks) if len(landmarks) else 0
+        self.rows = [
+            distances[k * self.n:(k + 1) * self.n]
+            for k in range(len(landmarks))
+        ]
+        # Largest stored distance in each row, computed on first use
+        self.radii = None
+
+    def lower_bound(self, a, b):
+        """
+        Return a lower bound on the distance between person indices
+        `a` and `b`, or math.inf if they are provably not connected.
+        People added after the index was built get no bound.
+        """
+        lower = 0
+        if a >= self.n or b >= self.n:
+            return lower
+        for row in self.rows:
+            da = row[a]
+            db = row[b]
+            if da == UNKNOWN or db == UNKNOWN:
+                if da != db:
+                    return math.inf
+                continue
+            if da == CAP or db == CAP:
+                continue
+            if da > db:
+                da, db = db, da
+            if db - da > lower:
+                lower = db - da
+        return lower
+
+    def bounds(self, a, b):
+        """
+        Return (lower, upper) bounds on the distance between person
+        indices `a` and `b`. Either may be math.inf.
+        """
+        lower = self.lower_bound(a, b)
+        if lower == math.inf:
+            return lower, lower
+        upper = math.inf
+        if a >= self.n or b >= self.n:
+            return lower, upper
+        for row in self.rows:
+            da = row[a]
+            db = row[b]
+            if da < CAP and db < CAP and da + db < upper:
+                upper = da + db
+        return lower, upper
+
+    def pruner(self, source, target, upper):
+        """
+        Return a `prune` callback for `bidirectional_search` that skips
+        people who cannot lie on a path of length at most `upper`.
+
+        Since source and target are connected, so is everyone the search
+        reaches, and only rows where the end being searched towards has a
+        stored distance can bound them. Those distances are looked up
+        once here. A row can give a bound of at most max(d, radius - d)
+        for an end at distance d, so layers deep enough that no row could
+        prune anyone are expanded without checking any rows.
+
+        Nor is anything pruned once the depths reached on both sides add
+        up to `upper`: the searches are then bound to meet in the layer
+        being expanded, so its people would never be expanded anyway.
+        """
+        if upper == math.inf or source >= self.n or target >= self.n:
+            return None
+        if self.radii is None:
+            # Distances of CAP and UNKNOWN are not real distances
+            ignore = bytes(range(CAP)) + bytes(2)
+            self.radii = [max(bytes(row).translate(ignore), default=0) for row in self.rows]
+        ends = {}
+        for forward, end in ((True, target), (False, source)):
+            ends[forward] = [
+                (row, row[end], max(row[end], radius - row[end]))
+                for row, radius in zip(self.rows, self.radii)
+                if row[end] < CAP
+            ]
+        n = self.n
+        deepest = {True: 0, False: 0}
+        # People already pruned on each side, which the search reaches
+        # again from their other neighbors at the same or greater depth
+        rejected = {True: set(), False: set()}
+
+        def prune(depth, forward):
+            deepest[forward] = depth
+            slack = upper - depth
+            rows = [(row, d) for row, d, bound in ends[forward] if bound > slack]
+            if not rows or depth + deepest[not forward] >= upper:
+                return None
+            pruned = rejected[forward]
+
+            def skip(v):
+                if v in pruned:
+                    return True
+                if v >= n:
+                    return False
+                for row, d in rows:
+                    dv = row[v]
+                    if dv < CAP and abs(dv - d) > slack:
+                        pruned.add(v)
+                        return True
+                return False
+            return skip
+        return prune
+
+
+def build_landmarks(graph, k):
+    """
+    Build a `LandmarkIndex` over `k` landmarks chosen farthest-first:
+    the person who appears in the largest total cast size, then each
+    time the person farthest from every landmark chosen so far. Spread
+    out landmarks give much tighter lower bounds than central ones on
+    graphs with long shortest paths, where pruning pays off.
+    """
+    n = len(graph.person_ids)
+
+    def degree(p):
+        return sum(
+            graph.movie_offsets[m + 1] - graph.movie_offsets[m]
+            for m in graph.movies_of(p)
+        )
+
+    landmarks = array("i")
+    distances = array("B")
+    # Distance from each person to the nearest landmark chosen so far
+    nearest = None
+    landmark = max(range(n), key=degree) if n else None
+    while landmark is not None and len(landmarks) < k:
+        landmarks.append(landmark)
+        distance = single_source(graph, landmark)[0]
+        distances.extend(
+            UNKNOWN if d == UNREACHABLE else min(d, CAP) for d in distance
+        )
+        if nearest is None:
+            nearest = distance
+        else:
+            nearest = array("i", (
+                d if d != UNREACHABLE and (e == UNREACHABLE or d < e) else e
+                for d, e in zip(distance, nearest)
+            ))
+        farthest = max(range(n), key=nearest.__getitem__)
+        landmark = farthest if nearest[farthest] > 0 else None
+    return LandmarkIndex(landmarks, distances)
+
+
+def write_landmarks(index, path, fingerprint):
+    """
+    Write `index` to `path` as a JSON header followed by the distance
+    rows, tagged with the CSV `fingerprint` it was built from.
+    """
+    header = json.dumps({
+        "fingerprint": fingerprint,
+        "landmarks": list(index.landmarks),
+        "n": index.n,
+    }).encode()
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for row in index.rows:
+            f.write(row)
+    os.replace(temporary, path)
+
+
+def open_landmarks(path, fingerprint=None):
+    """
+    Memory-map a landmark index written by `write_landmarks`.
+    Return None if it was built from CSV files other than `fingerprint`.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a landmark index")
+        length = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(length))
+        if fingerprint is not None and header["fingerprint"] != fingerprint:
+            return None
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    start = len(MAGIC) + 8 + length
+    size = len(header["landmarks"]) * header["n"]
+    distances = memoryview(mapping)[start:start + size]
+    return LandmarkIndex(array("i", header["landmarks"]), distances)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import csv
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+
+# Rows handed over per chunk, and chunks of stars buffered ahead
+CHUNK_SIZE = 65536
+QUEUE_CHUNKS = 16
+
+
+def read_chunks(filename, columns, stats, chunk_size=CHUNK_SIZE):
+    """
+    Yield lists of tuples of the requested `columns` from a CSV file.
+    Column positions are resolved from the header once, and rows too
+    short to hold them are counted in `stats["malformed"]` and skipped.
+    """
+    with open(filename, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        indices = [header.index(column) for column in columns]
+        width = max(indices) + 1
+        getter = itemgetter(*indices)
+        chunk = []
+        for row in reader:
+            if len(row) < width:
+                stats["malformed"] += 1
+                continue
+            chunk.append(getter(row))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def read_table(filename, columns, stats):
+    """
+    Return every row of a CSV file as a list of tuples.
+    """
+    rows = []
+    for chunk in read_chunks(filename, columns, stats):
+        rows.extend(chunk)
+    return rows
+
+
+def read_tables(directory):
+    """
+    Parse people.csv, movies.csv and stars.csv in `directory` at once.
+
+    Return (people, movies, star_chunks, stats): people and movies are
+    lists of (id, name, birth) and (id, title, year) tuples, star_chunks
+    yields lists of (person_id, movie_id) tuples while stars.csv is still
+    being read in the background, and stats counts rows per file plus
+    malformed rows, the star count being final once star_chunks is
+    exhausted. Callers add their own "dangling" and "duplicate" counts
+    for star rows they drop.
+    """
+    # Each reader thread counts into its own dictionary
+    people_stats = {"malformed": 0}
+    movie_stats = {"malformed": 0}
+    star_stats = {"malformed": 0}
+    chunks = queue.Queue(QUEUE_CHUNKS)
+
+    def read_stars():
+        try:
+            for chunk in read_chunks(f"{directory}/stars.csv",
+                                     ("person_id", "movie_id"), star_stats):
+                chunks.put(chunk)
+            chunks.put(None)
+        except Exception as e:
+            chunks.put(e)
+
+    threading.Thread(target=read_stars, daemon=True).start()
+    with ThreadPoolExecutor(2) as executor:
+        people = executor.submit(read_table, f"{directory}/people.csv",
+                                 ("id", "name", "birth"), people_stats)
+        movies = executor.submit(read_table, f"{directory}/movies.csv",
+                                 ("id", "title", "year"), movie_stats)
+        people = people.result()
+        movies = movies.result()
+    stats = {
+        "people": len(people),
+        "movies": len(movies),
+        "stars": 0,
+        "malformed": people_stats["malformed"] + movie_stats["malformed"],
+        "dangling": 0,
+        "duplicate": 0,
+    }
+
+    def star_chunks():
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                stats["malformed"] += star_stats["malformed"]
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            stats["stars"] += len(chunk)
+            yield chunk
+
+    return people, movies, star_chunks(), stats
@@ -0,0 +1,133 @@
+import bisect
+import heapq
+from array import array
+from collections import Counter
+
+# Fuzzy matching always uses the MIN_TRIGRAMS rarest query trigrams, and
+# any others found in fewer than 1 / COMMON_FRACTION of all names, then
+# rescores the RESCORE_FACTOR * limit best candidates exactly
+MIN_TRIGRAMS = 3
+COMMON_FRACTION = 50
+RESCORE_FACTOR = 10
+
+
+def normalize(name):
+    """
+    Lowercase `name` and collapse runs of whitespace.
+    """
+    return " ".join(name.lower().split())
+
+
+def trigrams(key):
+    """
+    Return the set of character trigrams of a normalized name,
+    padded so that word boundaries count as well.
+    """
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex():
+    """
+    Autocomplete and fuzzy lookup over person names.
+
+    Each person is an entry numbered in insertion order. The normalized
+    names are also kept in sorted order, so a prefix query is a bisect
+    followed by a short scan, and a trigram index maps each trigram to
+    the entries whose name contains it.
+    """
+
+    def __init__(self, person_ids, names):
+        self.person_ids = list(person_ids)
+        self.keys = [normalize(name) for name in names]
+        order = sorted(range(len(self.keys)), key=self.keys.__getitem__)
+        self.sorted_keys = [self.keys[i] for i in order]
+        self.sorted_entries = array("i", order)
+        self.sizes = array("H")
+        self.postings = {}
+        for entry, key in enumerate(self.keys):
+            self.index_trigrams(entry, key)
+
+    def add(self, person_id, name):
+        """
+        Add one more person to the index.
+        """
+        entry = len(self.keys)
+        key = normalize(name)
+        self.person_ids.append(person_id)
+        self.keys.append(key)
+        position = bisect.bisect_right(self.sorted_keys, key)
+        self.sorted_keys.insert(position, key)
+        self.sorted_entries.insert(position, entry)
+        self.index_trigrams(entry, key)
+
+    def index_trigrams(self, entry, key):
+        grams = trigrams(key)
+        self.sizes.append(len(grams))
+        for gram in grams:
+            self.postings.setdefault(gram, array("i")).append(entry)
+
+    def exact(self, name):
+        """
+        Return the ids of people whose normalized name equals `name`.
+        """
+        key = normalize(name)
+        lo = bisect.bisect_left(self.sorted_keys, key)
+        hi = bisect.bisect_right(self.sorted_keys, key, lo=lo)
+        return [self.person_ids[self.sorted_entries[i]] for i in range(lo, hi)]
+
+    def prefix(self, text, limit=10):
+        """
+        Return up to `limit` (person_id, name) pairs whose name starts
+        with `text`, in alphabetical order.
+        """
+        key = normalize(text)
+        results = []
+        i = bisect.bisect_left(self.sorted_keys, key)
+        while i < len(self.sorted_keys) and len(results) < limit:
+            if not self.sorted_keys[i].startswith(key):
+                break
+            entry = self.sorted_entries[i]
+            results.append((self.person_ids[entry], self.keys[entry]))
+            i += 1
+        return results
+
+    def fuzzy(self, text, limit=10):
+        """
+        Return up to `limit` (person_id, name, score) triples ranked by
+        trigram similarity to `text` (Dice coefficient, 1.0 is identical).
+
+        Candidates are counted over the query's rarest trigrams only,
+        skipping ones shared by a large fraction of all names, and the
+        best of them are then scored against every trigram of the query.
+        """
+        query = trigrams(normalize(text))
+        grams = sorted(query, key=lambda gram: len(self.postings.get(gram, ())))
+        common = max(len(self.keys) // COMMON_FRACTION, 1)
+        shared = Counter()
+        for k, gram in enumerate(grams):
+            postings = self.postings.get(gram, ())
+            if k >= MIN_TRIGRAMS and len(postings) > common:
+                break
+            shared.update(postings)
+        candidates = shared.most_common(limit * RESCORE_FACTOR)
+        best = heapq.nlargest(
+            limit,
+            ((2 * len(query & trigrams(self.keys[i])) / (len(query) + self.sizes[i]), i)
+             for i, _ in candidates),
+        )
+        return [(self.person_ids[i], self.keys[i], score) for score, i in best]
+
+    def search(self, text, limit=10):
+        """
+        Return up to `limit` ranked (person_id, name, score) candidates
+        for `text`: prefix matches first, then fuzzy matches.
+        """
+        results = [(person_id, name, 1.0) for person_id, name in self.prefix(text, limit)]
+        seen = set(person_id for person_id, _, _ in results)
+        for person_id, name, score in self.fuzzy(text, limit):
+            if len(results) == limit:
+                break
+            if person_id not in seen:
+                results.append((person_id, name, score))
+        return results
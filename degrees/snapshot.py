@@ -0,0 +1,152 @@
+import json
+import mmap
+import os
+import sys
+
+from graph import Graph, StringTable, load_graph
+
+# File written next to the CSV files by the compile step
+SNAPSHOT = "graph.snapshot"
+
+MAGIC = b"DEGSNAP1"
+
+# Graph attributes that are StringTables and plain int arrays
+TABLES = (
+    "person_ids", "person_names", "person_births",
+    "movie_ids", "movie_titles", "movie_years",
+)
+ARRAYS = (
+    "person_offsets", "person_movies", "movie_offsets", "movie_stars",
+    "name_order",
+)
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python snapshot.py directory")
+    directory = sys.argv[1]
+    graph = load_graph(directory)
+    path = os.path.join(directory, SNAPSHOT)
+    write_snapshot(graph, path, fingerprint(directory))
+    print(f"Wrote {path} ({os.path.getsize(path)} bytes).")
+
+
+def fingerprint(directory):
+    """
+    Return the size and modification time of each CSV file in
+    `directory`, used to tell whether a snapshot is stale.
+    """
+    result = {}
+    for filename in ("people.csv", "movies.csv", "stars.csv"):
+        stat = os.stat(os.path.join(directory, filename))
+        result[filename] = [stat.st_size, stat.st_mtime_ns]
+    return result
+
+
+def sections(graph):
+    """
+    Yield (name, typecode, buffer) for every array that makes up `graph`.
+    """
+    for name in TABLES:
+        table = getattr(graph, name)
+        yield f"{name}.offsets", "q", table.offsets
+        yield f"{name}.blob", "B", table.blob
+    for name in ARRAYS:
+        array = getattr(graph, name)
+        yield name, memoryview(array).format, array
+
+
+def write_snapshot(graph, path, fingerprint):
+    """
+    Write `graph` to `path` as a JSON header, which also keeps the row
+    counts of the load that built it, followed by the raw arrays, each
+    aligned to 8 bytes. The file is written under a temporary name
+    and moved into place so readers never see a partial snapshot.
+    """
+    if graph.has_updates():
+        raise ValueError("cannot snapshot a graph with added people, movies or stars")
+    layout = []
+    offset = 0
+    for name, typecode, buffer in sections(graph):
+        size = memoryview(buffer).nbytes
+        layout.append([name, typecode, offset, size])
+        offset += size + (-size % 8)
+    header = json.dumps({
+        "fingerprint": fingerprint, "stats": graph.stats, "sections": layout,
+    }).encode()
+    header += b" " * (-(len(MAGIC) + 8 + len(header)) % 8)
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for name, typecode, buffer in sections(graph):
+            size = memoryview(buffer).nbytes
+            f.write(buffer)
+            f.write(bytes(-size % 8))
+    os.replace(temporary, path)
+
+
+def read_header(f):
+    """
+    Return the decoded header of an open snapshot file and the
+    position where its data starts, or None if it is not a snapshot.
+    """
+    if f.read(len(MAGIC)) != MAGIC:
+        return None, 0
+    length = int.from_bytes(f.read(8), "little")
+    header = json.loads(f.read(length))
+    return header, len(MAGIC) + 8 + length
+
+
+def open_snapshot(path):
+    """
+    Memory-map a snapshot written by `write_snapshot` and return a
+    `Graph` whose arrays are views into the mapping, so nothing is
+    copied and the pages are shared between processes.
+    """
+    with open(path, "rb") as f:
+        header, start = read_header(f)
+        if header is None:
+            raise ValueError(f"{path} is not a degrees snapshot")
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    data = memoryview(mapping)
+    views = {}
+    for name, typecode, offset, size in header["sections"]:
+        views[name] = data[start + offset:start + offset + size].cast(typecode)
+    fields = {}
+    for name in TABLES:
+        fields[name] = StringTable(views[f"{name}.offsets"], views[f"{name}.blob"])
+    for name in ARRAYS:
+        fields[name] = views[name]
+    graph = Graph(**fields)
+    graph.stats = header.get("stats")
+    return graph
+
+
+def load_graph_cached(directory):
+    """
+    Return the graph for `directory`, memory-mapping its snapshot if it
+    is up to date with the CSV files and compiling a new one otherwise.
+    """
+    path = os.path.join(directory, SNAPSHOT)
+    current = fingerprint(directory)
+    try:
+        with open(path, "rb") as f:
+            header, _ = read_header(f)
+    except FileNotFoundError:
+        header = None
+    # Snapshots from before the row counts were kept are rebuilt too
+    if header is None or header["fingerprint"] != current or header.get("stats") is None:
+        graph = load_graph(directory)
+        try:
+            write_snapshot(graph, path, current)
+        except OSError:
+            # Read-only data directory, keep the graph in memory
+            return graph
+    return open_snapshot(path)
+
+
+if __name__ == "__main__":
+    main()
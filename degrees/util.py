@@ -1,3 +1,6 @@
+from collections import deque
+
+
 class Node():
     def __init__(self, state, parent, action):
         self.state = state
@@ -7,13 +10,16 @@ class Node():
 
 class StackFrontier():
     def __init__(self):
-        self.frontier = []
+        self.frontier = deque()
+        # Maps each state in the frontier to how many nodes hold it
+        self.states = {}
 
     def add(self, node):
         self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
@@ -22,10 +28,17 @@ class StackFrontier():
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
+            node = self.frontier.pop()
+            self.discard_state(node.state)
             return node
 
+    def discard_state(self, state):
+        count = self.states[state] - 1
+        if count == 0:
+            del self.states[state]
+        else:
+            self.states[state] = count
+
 
 class QueueFrontier(StackFrontier):
 
@@ -33,6 +46,159 @@ class QueueFrontier(StackFrontier):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
+            node = self.frontier.popleft()
+            self.discard_state(node.state)
             return node
+
+
+def bidirectional_search(source, target, neighbors, prune=None):
+    """
+    Breadth-first search from both `source` and `target` at once, always
+    expanding a full layer of the smaller frontier, until they meet.
+    `neighbors(state)` must return (action, state) pairs, and the graph
+    is assumed to be undirected.
+
+    If given, `prune(depth, forward)` is called before each layer is
+    expanded, with the depth its new states will have on their side. It
+    may return None to keep them all, or a function `skip(state)` called
+    for each newly reached state that returns True to leave it out. It
+    must never skip a state that lies on a shortest path.
+
+    Return the list of (action, state) pairs leading from source to
+    target, or None if target is unreachable.
+    """
+    if source == target:
+        return []
+    # Maps state to (parent state, action, depth) on each side
+    forward = {source: (None, None, 0)}
+    backward = {target: (None, None, 0)}
+    forward_layer = [source]
+    backward_layer = [target]
+    forward_depth = backward_depth = 0
+    while forward_layer and backward_layer:
+        if len(forward_layer) <= len(backward_layer):
+            forward_depth += 1
+            skip = prune(forward_depth, True) if prune is not None else None
+            forward_layer, meet = expand_layer(
+                forward_layer, forward, backward, neighbors, skip
+            )
+        else:
+            backward_depth += 1
+            skip = prune(backward_depth, False) if prune is not None else None
+            backward_layer, meet = expand_layer(
+                backward_layer, backward, forward, neighbors, skip
+            )
+        if meet is not None:
+            return join_paths(forward, backward, meet)
+    return None
+
+
+def expand_layer(layer, visited, other, neighbors, skip=None):
+    """
+    Expand every state in `layer`, recording parents in `visited` and
+    leaving out new states for which `skip(state)` is True.
+    Return the next layer and the meeting state with the smallest
+    total depth across both searches, or None if they did not meet.
+    """
+    next_layer = []
+    meet = None
+    best = None
+    for u in layer:
+        depth = visited[u][2] + 1
+        for action, v in neighbors(u):
+            if v in visited:
+                continue
+            if skip is not None and skip(v):
+                continue
+            visited[v] = (u, action, depth)
+            next_layer.append(v)
+            if v in other:
+                total = depth + other[v][2]
+                if best is None or total < best:
+                    meet, best = v, total
+    return next_layer, meet
+
+
+def join_paths(forward, backward, meet):
+    """
+    Stitch the forward and backward parent maps together at `meet`
+    into a list of (action, state) pairs from source to target.
+    """
+    path = []
+    u = meet
+    while forward[u][0] is not None:
+        parent, action, _ = forward[u]
+        path.append((action, u))
+        u = parent
+    path.reverse()
+    u = meet
+    while backward[u][0] is not None:
+        parent, action, _ = backward[u]
+        path.append((action, parent))
+        u = parent
+    return path
+
+
+def shortest_path_dag(source, target, neighbors):
+    """
+    Breadth-first search from `source` that keeps every parent lying on
+    a shortest path, stopping once the layer containing `target` is done.
+
+    Return a dictionary mapping each reached state to the list of
+    (action, parent) pairs one step closer to source, or None if target
+    is unreachable.
+    """
+    parents = {source: []}
+    layer = [source]
+    while layer and target not in parents:
+        next_parents = {}
+        for u in layer:
+            for action, v in neighbors(u):
+                if v in parents:
+                    continue
+                next_parents.setdefault(v, []).append((action, u))
+        parents.update(next_parents)
+        layer = list(next_parents)
+    if target not in parents:
+        return None
+    return parents
+
+
+def enumerate_paths(parents, source, target, key=None):
+    """
+    Lazily yield every path in a `shortest_path_dag` from source to
+    target as a list of (action, state) pairs.
+
+    If given, `key(action, parent)` orders the choices of parent at each
+    step, so paths come out sorted by their keys read from target back
+    to source.
+    """
+    def options(state):
+        choices = parents[state]
+        if key is not None:
+            choices = sorted(choices, key=lambda choice: key(*choice))
+        return iter(choices)
+
+    # Depth-first over the DAG with an explicit stack of iterators
+    suffix = []
+    states = [target]
+    stack = [options(target)]
+    while stack:
+        if states[-1] == source:
+            yield list(reversed(suffix))
+            stack.pop()
+            states.pop()
+            if suffix:
+                suffix.pop()
+            continue
+        choice = next(stack[-1], None)
+        if choice is None:
+            stack.pop()
+            states.pop()
+            if suffix:
+                suffix.pop()
+            continue
+        action, parent = choice
+        suffix.append((action, states[-1]))
+        states.append(parent)
+        stack.append(options(parent) if parent != source else iter(()))
@@ -3,6 +3,11 @@ import itertools
 import sys
 from typing import Dict, List
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 PROBS = {
     # Unconditional probabilities for having gene
     "gene": {2: 0.01, 1: 0.03, 0: 0.96},
@@ -31,31 +36,22 @@ def main():
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (
-                people[person]["trait"] is not None
-                and people[person]["trait"] != (person in have_trait)
-            )
-            for person in names
-        )
-        if fails_evidence:
-            continue
-
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+    # Loop over all assignments of genes and traits consistent with
+    # known information
+    pedigree = Pedigree(people)
+    for one_gene, two_genes, have_trait in assignments(people):
+        # Update probabilities with new joint probability
+        p = pedigree.joint_probability(one_gene, two_genes, have_trait)
+        update(probabilities, one_gene, two_genes, have_trait, p)
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
 
     # Print results
+    print_probabilities(people, probabilities)
+
+
+def print_probabilities(people, probabilities):
     for person in people:
         print(f"{person}:")
         for field in probabilities[person]:
@@ -105,6 +101,43 @@ def powerset(s):
     ]
 
 
+def assignments(people):
+    """
+    Yield every (one_gene, two_genes, have_trait) triple of sets that is
+    consistent with the known traits in `people`.
+
+    Each person takes one of 3 gene counts, times 2 trait values if their
+    trait is unknown or only the observed one otherwise. The assignments
+    are generated lazily as the product of these per-person states, so
+    people with known traits do not multiply the work and no powerset
+    lists are ever built.
+    """
+    names = list(people)
+    states = [
+        [
+            (gene, trait)
+            for gene in (0, 1, 2)
+            for trait in (
+                (False, True) if people[person]["trait"] is None
+                else (people[person]["trait"],)
+            )
+        ]
+        for person in names
+    ]
+    for assignment in itertools.product(*states):
+        one_gene = set()
+        two_genes = set()
+        have_trait = set()
+        for person, (gene, trait) in zip(names, assignment):
+            if gene == 1:
+                one_gene.add(person)
+            elif gene == 2:
+                two_genes.add(person)
+            if trait:
+                have_trait.add(person)
+        yield one_gene, two_genes, have_trait
+
+
 def inherit(origin: int) -> float:
     """
     return the probability of inherit particular gene
@@ -117,6 +150,109 @@ def inherit(origin: int) -> float:
         return 1 - PROBS["mutation"]
 
 
+class Pedigree():
+    """
+    Family structure of `people` compiled once for computing many joint
+    probabilities.
+
+    People are numbered in `names`, which lists parents before their
+    children. `mothers[i]` and `fathers[i]` are the numbers of person
+    i's parents, or -1 if unknown. The probabilities in PROBS are
+    precomputed as tables indexed by gene count:
+        founder[g]          P(g) for people without known parents
+        child[m][f][g]      P(g | mother has m copies, father has f)
+        trait[g][t]         P(trait is t | g)
+    """
+
+    def __init__(self, people):
+        # Topological order: a person comes after both of their parents
+        deg: Dict[str, int] = dict.fromkeys(people, 0)
+        G: Dict[str, List[str]] = {person: [] for person in people}
+        for person in people:
+            if people[person]["mother"]:
+                deg[person] += 2
+                G[people[person]["mother"]].append(person)
+                G[people[person]["father"]].append(person)
+        self.names = [person for person in people if deg[person] == 0]
+        for u in self.names:
+            for v in G[u]:
+                deg[v] -= 1
+                if deg[v] == 0:
+                    self.names.append(v)
+        if len(self.names) != len(people):
+            raise ValueError("pedigree has a cycle")
+        self.index = {person: i for i, person in enumerate(self.names)}
+        self.mothers = [
+            self.index[people[person]["mother"]] if people[person]["mother"] else -1
+            for person in self.names
+        ]
+        self.fathers = [
+            self.index[people[person]["father"]] if people[person]["father"] else -1
+            for person in self.names
+        ]
+
+        self.founder = [PROBS["gene"][g] for g in range(3)]
+        self.child = [[[0.0] * 3 for _ in range(3)] for _ in range(3)]
+        for m, f in itertools.product(range(3), repeat=2):
+            p1 = inherit(m)
+            p2 = inherit(f)
+            self.child[m][f][0] = (1 - p1) * (1 - p2)
+            self.child[m][f][1] = (1 - p1) * p2 + p1 * (1 - p2)
+            self.child[m][f][2] = p1 * p2
+        self.trait = [[PROBS["trait"][g][False], PROBS["trait"][g][True]] for g in range(3)]
+
+    def probability(self, genes, traits) -> float:
+        """
+        Return the joint probability of gene counts `genes` and traits
+        `traits` (booleans), both indexed by person number.
+        """
+        founder = self.founder
+        child = self.child
+        trait = self.trait
+        fathers = self.fathers
+        p = 1.0
+        for i, mother in enumerate(self.mothers):
+            g = genes[i]
+            if mother < 0:
+                p *= founder[g] * trait[g][traits[i]]
+            else:
+                p *= child[genes[mother]][genes[fathers[i]]][g] * trait[g][traits[i]]
+        return p
+
+    def probabilities(self, genes, traits):
+        """
+        Same as `probability` for many assignments at once: `genes` and
+        `traits` are NumPy arrays with one row per assignment and one
+        column per person. Return the array of joint probabilities.
+        """
+        if np is None:
+            return [self.probability(g, t) for g, t in zip(genes, traits)]
+        genes = np.asarray(genes, dtype=np.intp)
+        traits = np.asarray(traits, dtype=np.intp)
+        mothers = np.array(self.mothers)
+        fathers = np.array(self.fathers)
+        founders = mothers < 0
+        children = ~founders
+        p = np.array(self.trait)[genes, traits].prod(axis=1)
+        p *= np.array(self.founder)[genes[:, founders]].prod(axis=1)
+        p *= np.array(self.child)[
+            genes[:, mothers[children]], genes[:, fathers[children]], genes[:, children]
+        ].prod(axis=1)
+        return p
+
+    def joint_probability(self, one_gene, two_genes, have_trait) -> float:
+        """
+        Same as `joint_probability` for the people this pedigree was
+        compiled from.
+        """
+        genes = [
+            1 if person in one_gene else 2 if person in two_genes else 0
+            for person in self.names
+        ]
+        traits = [person in have_trait for person in self.names]
+        return self.probability(genes, traits)
+
+
 def joint_probability(people, one_gene, two_genes, have_trait):
     """
     Compute and return a joint probability.
@@ -0,0 +1,294 @@
+import heapq
+import itertools
+import sys
+
+from heredity import PROBS, inherit, load_data, print_probabilities
+
+# Number of copies of the gene a person can have
+GENES = (0, 1, 2)
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python inference.py data.csv")
+    people = load_data(sys.argv[1])
+    print_probabilities(people, exact_probabilities(people))
+
+
+class Factor():
+    """
+    Nonnegative function of the gene counts of some people: `table` maps
+    each assignment of GENES to `variables`, in that order, to a value.
+
+    Only the ratios between values matter, so products and marginals are
+    scaled to sum to 1. This keeps a parent's product of the messages of
+    hundreds of children from underflowing to 0.
+    """
+
+    def __init__(self, variables, table):
+        self.variables = tuple(variables)
+        self.table = table
+
+    @classmethod
+    def unit(cls, variables):
+        variables = tuple(variables)
+        return cls(variables, dict.fromkeys(itertools.product(GENES, repeat=len(variables)), 1.0))
+
+    def product(self, other):
+        """
+        Return the factor over the variables of both factors whose value
+        is proportional to the product of theirs.
+        """
+        variables = self.variables + tuple(
+            v for v in other.variables if v not in self.variables
+        )
+        mine = [variables.index(v) for v in self.variables]
+        theirs = [variables.index(v) for v in other.variables]
+        table = {}
+        for assignment in itertools.product(GENES, repeat=len(variables)):
+            table[assignment] = (
+                self.table[tuple(assignment[i] for i in mine)]
+                * other.table[tuple(assignment[i] for i in theirs)]
+            )
+        return Factor(variables, scaled(table))
+
+    def marginal(self, variables):
+        """
+        Return the factor over `variables` obtained by summing out all the
+        others.
+        """
+        variables = tuple(v for v in self.variables if v in variables)
+        keep = [self.variables.index(v) for v in variables]
+        table = dict.fromkeys(itertools.product(GENES, repeat=len(variables)), 0.0)
+        for assignment, value in self.table.items():
+            table[tuple(assignment[i] for i in keep)] += value
+        return Factor(variables, scaled(table))
+
+
+def scaled(table):
+    """
+    Return `table` with its values divided by their sum.
+    """
+    total = sum(table.values())
+    return {key: value / total for key, value in table.items()}
+
+
+def gene_factor(people, person):
+    """
+    Return the factor P(gene of `person` | genes of their parents) times
+    P(observed trait | gene), if their trait is known.
+    """
+    mother = people[person]["mother"]
+    father = people[person]["father"]
+    trait = people[person]["trait"]
+
+    def evidence(gene):
+        return PROBS["trait"][gene][trait] if trait is not None else 1.0
+
+    if mother is None:
+        return Factor((person,), {
+            (gene,): PROBS["gene"][gene] * evidence(gene) for gene in GENES
+        })
+    table = {}
+    for gene, m, f in itertools.product(GENES, repeat=3):
+        p1 = inherit(m)
+        p2 = inherit(f)
+        if gene == 0:
+            p = (1 - p1) * (1 - p2)
+        elif gene == 1:
+            p = (1 - p1) * p2 + p1 * (1 - p2)
+        else:
+            p = p1 * p2
+        table[(gene, m, f)] = p * evidence(gene)
+    return Factor((person, mother, father), table)
+
+
+def elimination_order(people):
+    """
+    Return an order in which to eliminate the people of the moralized
+    pedigree (each person joined to their parents, and the parents to
+    each other), and the clique formed by eliminating each person: the
+    person and their remaining neighbors.
+
+    A pedigree with no loops has a chordal moral graph, for which
+    maximum cardinality search finds an order that never needs a new
+    edge in linear time, so every clique has at most three people.
+    Pedigrees with loops are eliminated greedily instead, choosing the
+    person whose elimination adds the fewest new edges.
+    """
+    graph = {person: set() for person in people}
+    for person in people:
+        parents = [people[person]["mother"], people[person]["father"]]
+        family = [person] + [parent for parent in parents if parent is not None]
+        for a, b in itertools.combinations(family, 2):
+            graph[a].add(b)
+            graph[b].add(a)
+    result = perfect_elimination_order(graph)
+    if result is not None:
+        return result
+    return min_fill_order(graph)
+
+
+def perfect_elimination_order(graph):
+    """
+    Return the reverse of a maximum cardinality search of `graph` (each
+    step visits a person with the most visited neighbors) and its
+    cliques, or None if eliminating in that order needs a new edge,
+    which means that `graph` is not chordal.
+    """
+    # People not yet visited, by how many of their neighbors have been
+    weight = dict.fromkeys(graph, 0)
+    buckets = [dict.fromkeys(graph)]
+    best = 0
+    visited = []
+    while len(visited) < len(graph):
+        while not buckets[best]:
+            best -= 1
+        person, _ = buckets[best].popitem()
+        del weight[person]
+        visited.append(person)
+        for neighbor in graph[person]:
+            if neighbor in weight:
+                del buckets[weight[neighbor]][neighbor]
+                weight[neighbor] += 1
+                if weight[neighbor] == len(buckets):
+                    buckets.append({})
+                buckets[weight[neighbor]][neighbor] = None
+                best = max(best, weight[neighbor])
+
+    order = visited[::-1]
+    position = {person: i for i, person in enumerate(order)}
+    cliques = []
+    for i, person in enumerate(order):
+        later = [neighbor for neighbor in graph[person] if position[neighbor] > i]
+        # The later neighbors must already be joined to each other
+        for a, b in itertools.combinations(later, 2):
+            if b not in graph[a]:
+                return None
+        cliques.append({person, *later})
+    return order, cliques
+
+
+def min_fill_order(graph):
+    """
+    Return the order and cliques of eliminating the people of `graph`
+    greedily, each time choosing the person whose elimination adds the
+    fewest new edges. Consumes `graph`.
+    """
+    def fill(person):
+        # Pairs of neighbors less those already joined, counting the
+        # edges with set intersections since a parent of many children
+        # has too many neighbors to try every pair
+        neighbors = graph[person]
+        joined = sum(len(graph[a] & neighbors) for a in neighbors) // 2
+        return len(neighbors) * (len(neighbors) - 1) // 2 - joined
+
+    heap = [(fill(person), len(graph[person]), person) for person in graph]
+    heapq.heapify(heap)
+    # People whose neighbors were eliminated since their entry was pushed
+    dirty = set()
+    order = []
+    cliques = []
+    while heap:
+        _, _, person = heapq.heappop(heap)
+        if person in dirty:
+            dirty.discard(person)
+            heapq.heappush(heap, (fill(person), len(graph[person]), person))
+            continue
+        neighbors = graph.pop(person)
+        for a, b in itertools.combinations(neighbors, 2):
+            graph[a].add(b)
+            graph[b].add(a)
+        for neighbor in neighbors:
+            graph[neighbor].discard(person)
+            dirty.add(neighbor)
+        order.append(person)
+        cliques.append({person} | neighbors)
+    return order, cliques
+
+
+def exact_probabilities(people):
+    """
+    Return the same gene and trait distributions as enumeration in
+    `heredity.main`, computed exactly on a junction tree.
+
+    Eliminating the people in `elimination_order` gives a tree of
+    cliques: the clique of person i is linked to that of the first of
+    its other members to be eliminated. Each person's factor goes into
+    the clique of the first of its people eliminated. Messages are then
+    passed up the tree in elimination order and back down in reverse
+    (Shafer-Shenoy), after which every clique holds the joint
+    distribution of its people given all of the evidence.
+    """
+    order, cliques = elimination_order(people)
+    position = {person: i for i, person in enumerate(order)}
+    parent = [
+        min((position[member] for member in clique if member != order[i]), default=None)
+        for i, clique in enumerate(cliques)
+    ]
+    children = [[] for _ in cliques]
+    for i, p in enumerate(parent):
+        if p is not None:
+            children[p].append(i)
+
+    potentials = [Factor.unit(sorted(clique, key=position.get)) for clique in cliques]
+    for person in people:
+        factor = gene_factor(people, person)
+        i = min(position[member] for member in factor.variables)
+        potentials[i] = potentials[i].product(factor)
+
+    def separator(i):
+        return cliques[i] - {order[i]}
+
+    # Upward pass: children are always eliminated before their parent
+    up = [None] * len(cliques)
+    for i in range(len(cliques)):
+        if parent[i] is None:
+            continue
+        belief = potentials[i]
+        for child in children[i]:
+            belief = belief.product(up[child])
+        up[i] = belief.marginal(separator(i))
+
+    # Downward pass, from the roots back to the leaves. Each child gets
+    # the product of its siblings' messages, built from the products of
+    # those before it and after it so a clique with k children takes
+    # O(k) products rather than O(k^2)
+    down = [None] * len(cliques)
+    for i in reversed(range(len(cliques))):
+        if not children[i]:
+            continue
+        belief = potentials[i]
+        if down[i] is not None:
+            belief = belief.product(down[i])
+        before = [belief]
+        for child in children[i][:-1]:
+            before.append(before[-1].product(up[child]))
+        after = None
+        for j in reversed(range(len(children[i]))):
+            child = children[i][j]
+            belief = before[j] if after is None else before[j].product(after)
+            down[child] = belief.marginal(separator(child))
+            after = up[child] if after is None else up[child].product(after)
+
+    probabilities = {}
+    for person in people:
+        i = position[person]
+        belief = potentials[i]
+        if down[i] is not None:
+            belief = belief.product(down[i])
+        for child in children[i]:
+            belief = belief.product(up[child])
+        genes = belief.marginal((person,)).table
+        gene = {g: genes[(g,)] for g in (2, 1, 0)}
+        trait = people[person]["trait"]
+        if trait is None:
+            have = sum(gene[g] * PROBS["trait"][g][True] for g in GENES)
+        else:
+            have = 1.0 if trait else 0.0
+        probabilities[person] = {"gene": gene, "trait": {True: have, False: 1 - have}}
+    return probabilities
+
+
+if __name__ == "__main__":
+    main()
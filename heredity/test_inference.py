@@ -0,0 +1,62 @@
+import time
+import unittest
+
+from inference import elimination_order, exact_probabilities
+
+
+def family(children):
+    """
+    Return a couple, one with the trait and one without, and `children`
+    children of theirs whose trait is unknown.
+    """
+    people = {
+        "Lily": {"name": "Lily", "mother": None, "father": None, "trait": True},
+        "James": {"name": "James", "mother": None, "father": None, "trait": False},
+    }
+    for i in range(children):
+        name = f"Child {i}"
+        people[name] = {"name": name, "mother": "Lily", "father": "James", "trait": None}
+    return people
+
+
+class WideSibshipTest(unittest.TestCase):
+
+    def test_many_children_do_not_underflow(self):
+        # Children of unknown trait say nothing about their parents, so
+        # the parents' distributions must not change however many there are
+        alone = exact_probabilities(family(1))
+        wide = exact_probabilities(family(350))
+        for person in ("Lily", "James", "Child 0"):
+            for g in (0, 1, 2):
+                self.assertAlmostEqual(alone[person]["gene"][g], wide[person]["gene"][g])
+            self.assertAlmostEqual(alone[person]["trait"][True], wide[person]["trait"][True])
+        self.assertAlmostEqual(wide["Child 349"]["gene"][1], wide["Child 0"]["gene"][1])
+
+    def test_order_scales_linearly(self):
+        # Four times the children should take about four times as long,
+        # and nowhere near the sixteen of a quadratic order
+        def seconds(children):
+            people = family(children)
+            best = float("inf")
+            for _ in range(3):
+                start = time.perf_counter()
+                elimination_order(people)
+                best = min(best, time.perf_counter() - start)
+            return best
+        self.assertLess(seconds(4000) / seconds(1000), 8)
+
+    def test_married_children_need_no_new_edges(self):
+        # Two couples' children marry and have children of their own
+        people = family(0)
+        for name, mother, father in [
+            ("Molly", None, None), ("Arthur", None, None),
+            ("Harry", "Lily", "James"), ("Ginny", "Molly", "Arthur"),
+            ("Albus", "Ginny", "Harry"), ("Lily Luna", "Ginny", "Harry"),
+        ]:
+            people[name] = {"name": name, "mother": mother, "father": father, "trait": None}
+        _, cliques = elimination_order(people)
+        self.assertLessEqual(max(len(clique) for clique in cliques), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,249 @@
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import pagerank
+from blocks import block_pagerank, build_blocks
+from crawler import CACHE, crawl_cached, load_link_matrix
+from matrix import np, power_iteration
+from sampling import sample, sample_batched
+from solvers import SOLVERS, solve
+
+USAGE = """Usage:
+  python benchmark.py generate directory pages [dangling fraction] [seed]
+  python benchmark.py run directory [samples] [output.json]
+  python benchmark.py scales directory pages,pages,... [samples] [output.json]"""
+
+# Edge list written next to the HTML files, in the `crawl_to_disk` format
+EDGES = "links"
+
+# File marking a directory as written by `generate`, which is then free
+# to delete it when asked to generate a new corpus in its place
+MARKER = ".pagerank-benchmark"
+
+# Shape of the synthetic web: Pareto exponents of how many links a page
+# has and of how often each page is linked to, and the default fraction
+# of pages without links
+OUT_SHAPE = 1.5
+IN_SHAPE = 1.2
+DANGLING = 0.1
+
+DAMPING = 0.85
+REFERENCE_TOLERANCE = 1e-12
+
+# The original CS50 functions are quadratic in the number of pages and
+# only run on corpora up to this size
+ORIGINAL_PAGES = 1000
+
+
+def main():
+    if len(sys.argv) in (4, 5, 6) and sys.argv[1] == "generate":
+        dangling = float(sys.argv[4]) if len(sys.argv) >= 5 else DANGLING
+        seed = int(sys.argv[5]) if len(sys.argv) == 6 else 0
+        counts = generate(sys.argv[2], int(float(sys.argv[3])), dangling, seed)
+        print(json.dumps(counts))
+    elif len(sys.argv) in (3, 4, 5) and sys.argv[1] == "run":
+        samples = int(float(sys.argv[3])) if len(sys.argv) >= 4 else 100000
+        report([run(sys.argv[2], samples)], sys.argv[4] if len(sys.argv) == 5 else None)
+    elif len(sys.argv) in (4, 5, 6) and sys.argv[1] == "scales":
+        samples = int(float(sys.argv[4])) if len(sys.argv) >= 5 else 100000
+        results = []
+        for pages in sys.argv[3].split(","):
+            directory = os.path.join(sys.argv[2], pages)
+            generate(directory, int(float(pages)))
+            results.append(run(directory, samples))
+        report(results, sys.argv[5] if len(sys.argv) == 6 else None)
+    else:
+        sys.exit(USAGE)
+
+
+def report(runs, output=None):
+    text = json.dumps({
+        "benchmark": "pagerank",
+        "python": platform.python_version(),
+        "numpy": np.__version__ if np is not None else None,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "runs": runs,
+    }, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+def generate(directory, pages, dangling=DANGLING, seed=0):
+    """
+    Write a synthetic corpus of `pages` HTML files to `directory`, and
+    the same link graph as `{directory}/links.pages` and `links.edges`.
+
+    A `dangling` fraction of the pages has no links. The others have a
+    Pareto-distributed number of links, pointing at pages drawn with
+    Pareto-distributed popularity, so both in- and out-degrees follow
+    a power law the way they do on the web.
+    Return the number of pages, links and dangling pages written.
+
+    Raise ValueError rather than overwrite a directory that is not empty
+    and was not written by `generate`.
+    """
+    rng = random.Random(seed)
+    if os.path.isdir(directory) and os.listdir(directory):
+        if not os.path.exists(os.path.join(directory, MARKER)):
+            raise ValueError(f"{directory} is not empty and was not written by generate")
+        shutil.rmtree(directory)
+    os.makedirs(directory, exist_ok=True)
+    open(os.path.join(directory, MARKER), "w").close()
+    names = [f"{i}.html" for i in range(pages)]
+
+    # Cumulative popularity weights for drawing link targets
+    weights = []
+    total = 0.0
+    for _ in range(pages):
+        total += rng.paretovariate(IN_SHAPE)
+        weights.append(total)
+
+    links = 0
+    empty = 0
+    with open(os.path.join(directory, f"{EDGES}.edges"), "wb") as f:
+        for u, name in enumerate(names):
+            if rng.random() < dangling:
+                targets = set()
+            else:
+                degree = min(int(rng.paretovariate(OUT_SHAPE)), pages - 1)
+                targets = set(rng.choices(range(pages), cum_weights=weights, k=degree))
+                targets.discard(u)
+            with open(os.path.join(directory, name), "w", encoding="utf-8") as page:
+                page.write(f"<!DOCTYPE html>\n<html>\n<head><title>{u}</title></head>\n<body>\n")
+                page.write(f"<h1>Page {u}</h1>\n")
+                for v in sorted(targets):
+                    page.write(f'<p><a href="{names[v]}">Page {v}</a></p>\n')
+                page.write("</body>\n</html>\n")
+            edges = array("i")
+            for v in sorted(targets):
+                edges.append(u)
+                edges.append(v)
+            edges.tofile(f)
+            links += len(targets)
+            empty += not targets
+    with open(os.path.join(directory, f"{EDGES}.pages"), "w", encoding="utf-8") as f:
+        for name in names:
+            f.write(name + "\n")
+    return {"pages": pages, "links": links, "dangling": empty}
+
+
+def run(directory, samples, seed=0):
+    """
+    Time crawling, solving and sampling the corpus in `directory`, each
+    in its own process so peak memory is measured separately, and
+    compare every result with a tightly converged reference.
+    Return the results as a JSON-serializable dictionary.
+    """
+    # Executor workers, unlike Pool ones, may start the crawler's own pool
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(1, mp_context=context) as executor:
+        reference = executor.submit(measure_reference, directory).result()
+    tasks = ["crawl", "crawl_cached"]
+    tasks += [f"solve:{method}" for method in SOLVERS]
+    tasks += ["power_iteration", "block_pagerank", "sample", "sample_batched"]
+    if reference["pages"] <= ORIGINAL_PAGES:
+        tasks += ["iterate_pagerank", "sample_pagerank"]
+    results = []
+    for task in tasks:
+        with ProcessPoolExecutor(1, mp_context=context) as executor:
+            results.append(executor.submit(measure, directory, task, samples, seed,
+                                           reference["ranks"]).result())
+    del reference["ranks"]
+    return {"directory": directory, "reference": reference, "results": results}
+
+
+def measure_reference(directory):
+    matrix = load_link_matrix(os.path.join(directory, EDGES))
+    start = time.perf_counter()
+    ranks = power_iteration(matrix, DAMPING, REFERENCE_TOLERANCE)
+    return {
+        "pages": len(matrix),
+        "links": len(matrix.targets),
+        "dangling": len(matrix.dangling),
+        "seconds": time.perf_counter() - start,
+        "ranks": matrix.to_dict(ranks),
+    }
+
+
+def measure(directory, task, samples, seed, reference):
+    """
+    Run one benchmark `task` on `directory` and return its timings,
+    throughput, peak memory and L1 error against `reference`.
+    """
+    result = {"task": task}
+    if task in ("crawl", "crawl_cached"):
+        cache = os.path.join(directory, CACHE)
+        if os.path.exists(cache):
+            os.remove(cache)
+        start = time.perf_counter()
+        corpus = pagerank.crawl(directory) if task == "crawl" else crawl_cached(directory)
+        result["seconds"] = time.perf_counter() - start
+        result["pages_per_second"] = len(corpus) / result["seconds"]
+    elif task == "block_pagerank":
+        prefix = os.path.join(directory, EDGES)
+        start = time.perf_counter()
+        build_blocks(prefix)
+        result["build_seconds"] = time.perf_counter() - start
+        start = time.perf_counter()
+        ranks = block_pagerank(f"{prefix}.blocks", DAMPING)
+        result["seconds"] = time.perf_counter() - start
+        os.remove(f"{prefix}.blocks")
+        with open(f"{prefix}.pages", encoding="utf-8") as f:
+            pages = f.read().splitlines()
+        result["l1_error"] = l1_error(dict(zip(pages, ranks)), reference)
+    elif task in ("iterate_pagerank", "sample_pagerank"):
+        corpus = pagerank.crawl(directory)
+        random.seed(seed)
+        start = time.perf_counter()
+        if task == "iterate_pagerank":
+            ranks = pagerank.iterate_pagerank(corpus, DAMPING)
+        else:
+            ranks = pagerank.sample_pagerank(corpus, DAMPING, samples)
+            result["samples_per_second"] = samples / (time.perf_counter() - start)
+        result["seconds"] = time.perf_counter() - start
+        result["l1_error"] = l1_error(ranks, reference)
+    else:
+        matrix = load_link_matrix(os.path.join(directory, EDGES))
+        start = time.perf_counter()
+        if task.startswith("solve:"):
+            solved = solve(matrix, DAMPING, task[len("solve:"):])
+            ranks = solved.ranks
+            result["iterations"] = solved.iterations
+            result["edges_per_second"] = solved.work / solved.seconds
+            result["error_bound"] = solved.error_bound
+        elif task == "power_iteration":
+            ranks = power_iteration(matrix, DAMPING)
+        elif task == "sample":
+            counts = sample(matrix, DAMPING, samples, random.Random(seed))
+            ranks = [count / samples for count in counts]
+        else:
+            counts = sample_batched(matrix, DAMPING, samples, seed=seed)
+            ranks = [count / samples for count in counts]
+        result["seconds"] = time.perf_counter() - start
+        if task.startswith("sample"):
+            result["samples_per_second"] = samples / result["seconds"]
+        result["l1_error"] = l1_error(matrix.to_dict(ranks), reference)
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result["peak_rss_mb"] = peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+    return result
+
+
+def l1_error(ranks, reference):
+    return sum(abs(ranks.get(page, 0.0) - rank) for page, rank in reference.items())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import heapq
+import json
+import mmap
+import os
+import sys
+from array import array
+
+from matrix import MAX_ITERATIONS, TOLERANCE, np
+
+USAGE = """Usage:
+  python blocks.py build output [edges per block]
+  python blocks.py rank output"""
+
+MAGIC = b"PRBLOCK1"
+
+# Links per block, so that one block's edges fit comfortably in memory,
+# and links read from the edge list at a time while building
+BLOCK_EDGES = 1 << 20
+CHUNK_EDGES = 1 << 16
+
+DAMPING = 0.85
+TOP = 20
+
+
+def main():
+    if len(sys.argv) in (3, 4) and sys.argv[1] == "build":
+        block_edges = int(sys.argv[3]) if len(sys.argv) == 4 else BLOCK_EDGES
+        header = build_blocks(sys.argv[2], block_edges)
+        print(f"Wrote {header['edges']} links of {header['pages']} pages "
+              f"in {len(header['blocks'])} blocks to {sys.argv[2]}.blocks.")
+    elif len(sys.argv) == 3 and sys.argv[1] == "rank":
+        ranks = block_pagerank(f"{sys.argv[2]}.blocks", DAMPING)
+        best = heapq.nlargest(TOP, range(len(ranks)), key=ranks.__getitem__)
+        names = page_names(f"{sys.argv[2]}.pages", set(best))
+        print(f"Top {len(best)} pages by PageRank")
+        for u in best:
+            print(f"  {names[u]}: {ranks[u]:.6f}")
+    else:
+        sys.exit(USAGE)
+
+
+def read_edges(path):
+    """
+    Yield the links of an edge list written by `crawl_to_disk` as arrays
+    of up to CHUNK_EDGES (source, target) pairs, flattened.
+    """
+    with open(path, "rb") as f:
+        while True:
+            edges = array("i")
+            edges.frombytes(f.read(CHUNK_EDGES * 2 * edges.itemsize))
+            if not edges:
+                return
+            yield edges
+
+
+def build_blocks(output, block_edges=BLOCK_EDGES):
+    """
+    Sort the edge list written by `crawl_to_disk(directory, output)` by
+    link source into `{output}.blocks` without holding it in memory:
+    a JSON header, the out-degree of every page, then the (source,
+    target) pairs, cut into blocks of consecutive sources holding about
+    `block_edges` links each.
+
+    The edges are read twice: once to count out-degrees and plan the
+    blocks, and once to spill each link into its block's temporary file.
+    Each block is then sorted in memory on its own.
+    Return the header.
+    """
+    with open(f"{output}.pages", encoding="utf-8") as f:
+        n = sum(1 for _ in f)
+    out_degree = array("i", bytes(4 * n))
+    for edges in read_edges(f"{output}.edges"):
+        for k in range(0, len(edges), 2):
+            out_degree[edges[k]] += 1
+
+    # Block i holds the links of pages firsts[i] to firsts[i + 1] - 1
+    firsts = [0]
+    count = 0
+    for u in range(n):
+        if count and count + out_degree[u] > block_edges:
+            firsts.append(u)
+            count = 0
+        count += out_degree[u]
+    firsts.append(n)
+    block_of = array("i", bytes(4 * n))
+    for i in range(len(firsts) - 1):
+        for u in range(firsts[i], firsts[i + 1]):
+            block_of[u] = i
+
+    spills = [f"{output}.blocks.{i}" for i in range(len(firsts) - 1)]
+    for spill in spills:
+        # Left over from a build that was interrupted
+        if os.path.exists(spill):
+            os.remove(spill)
+    for edges in read_edges(f"{output}.edges"):
+        buffers = {}
+        for k in range(0, len(edges), 2):
+            buffer = buffers.setdefault(block_of[edges[k]], array("i"))
+            buffer.append(edges[k])
+            buffer.append(edges[k + 1])
+        for i, buffer in buffers.items():
+            with open(spills[i], "ab") as f:
+                buffer.tofile(f)
+    del block_of
+
+    blocks = []
+    offset = 4 * n + (-4 * n % 8)
+    for i in range(len(spills)):
+        size = sum(out_degree[firsts[i]:firsts[i + 1]])
+        blocks.append([firsts[i], firsts[i + 1], offset, size])
+        offset += 8 * size
+    header = {"pages": n, "edges": sum(block[3] for block in blocks), "blocks": blocks}
+    encoded = json.dumps(header).encode()
+    encoded += b" " * (-(len(MAGIC) + 8 + len(encoded)) % 8)
+
+    temporary = f"{output}.blocks.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(encoded).to_bytes(8, "little"))
+        f.write(encoded)
+        out_degree.tofile(f)
+        f.write(bytes(-4 * n % 8))
+        for (first, last, _, size), spill in zip(blocks, spills):
+            edges = array("i")
+            if size:
+                with open(spill, "rb") as g:
+                    edges.frombytes(g.read())
+                os.remove(spill)
+            f.write(sort_block(edges, first, last))
+    os.replace(temporary, f"{output}.blocks")
+    return header
+
+
+def sort_block(edges, first, last):
+    """
+    Return flattened (source, target) pairs with sources in [first, last)
+    sorted by source, keeping the order of each page's links.
+    """
+    position = array("q", bytes(8 * (last - first + 1)))
+    for k in range(0, len(edges), 2):
+        position[edges[k] - first + 1] += 2
+    for u in range(last - first):
+        position[u + 1] += position[u]
+    result = array("i", bytes(4 * len(edges)))
+    for k in range(0, len(edges), 2):
+        u = edges[k] - first
+        result[position[u]] = edges[k]
+        result[position[u] + 1] = edges[k + 1]
+        position[u] += 2
+    return result
+
+
+def open_blocks(path):
+    """
+    Memory-map a file written by `build_blocks`.
+    Return its header, the out-degree array and a list of flattened
+    (source, target) arrays, one per block, all views into the mapping.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a PageRank block file")
+        length = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(length))
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    data = memoryview(mapping)[len(MAGIC) + 8 + length:]
+    out_degree = data[:4 * header["pages"]].cast("i")
+    blocks = [
+        data[offset:offset + 8 * size].cast("i")
+        for _, _, offset, size in header["blocks"]
+    ]
+    return header, out_degree, blocks
+
+
+def block_pagerank(path, damping_factor, tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS):
+    """
+    Return the PageRank vector of the block file at `path` as an array,
+    computed like `power_iteration` but streaming the memory-mapped
+    blocks once per sweep. Only the current and the next rank vector are
+    held in memory; the links are paged in from disk by the OS as each
+    block is read.
+    """
+    header, out_degree, blocks = open_blocks(path)
+    n = header["pages"]
+    d = float(damping_factor)
+    if np is not None:
+        return numpy_block_pagerank(n, d, out_degree, blocks, tolerance, max_iterations)
+    ranks = array("d", [1 / n]) * n
+    for _ in range(max_iterations):
+        dangling = sum(ranks[u] for u in range(n) if not out_degree[u])
+        new_ranks = array("d", [(1 - d + d * dangling) / n]) * n
+        for edges in blocks:
+            for k in range(0, len(edges), 2):
+                u = edges[k]
+                new_ranks[edges[k + 1]] += d * ranks[u] / out_degree[u]
+        change = sum(abs(new_ranks[v] - ranks[v]) for v in range(n))
+        ranks = new_ranks
+        if change < tolerance:
+            break
+    return ranks
+
+
+def numpy_block_pagerank(n, d, out_degree, blocks, tolerance, max_iterations):
+    """
+    Same as `block_pagerank`, scattering one block of links at a time
+    into the next rank vector with NumPy.
+    """
+    out_degree = np.frombuffer(out_degree, dtype=np.int32)
+    dangling = out_degree == 0
+    ranks = np.full(n, 1 / n)
+    for _ in range(max_iterations):
+        new_ranks = np.full(n, (1 - d + d * ranks[dangling].sum()) / n)
+        for edges in blocks:
+            pairs = np.frombuffer(edges, dtype=np.int32).reshape(-1, 2)
+            sources = pairs[:, 0]
+            np.add.at(new_ranks, pairs[:, 1], d * ranks[sources] / out_degree[sources])
+        change = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if change < tolerance:
+            break
+    return array("d", ranks.tobytes())
+
+
+def page_names(path, wanted):
+    """
+    Return {page number: name} for the page numbers in `wanted`, reading
+    the page list written by `crawl_to_disk` one line at a time.
+    """
+    names = {}
+    with open(path, encoding="utf-8") as f:
+        for u, line in enumerate(f):
+            if u in wanted:
+                names[u] = line.rstrip("\n")
+    return names
+
+
+if __name__ == "__main__":
+    main()
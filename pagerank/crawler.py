@@ -0,0 +1,213 @@
+import json
+import os
+import re
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from matrix import LinkMatrix
+
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Characters read per chunk, and the most kept back from the end of a
+# chunk so that a link tag split across two chunks is still found
+CHUNK_SIZE = 1 << 16
+OVERLAP = 4096
+
+# Files handed to a worker process at a time
+FILES_PER_TASK = 64
+
+# Cache of parsed links written into the corpus directory, and how many
+# changed files are worth starting a process pool for
+CACHE = ".pagerank-cache.json"
+CACHE_VERSION = 1
+PARALLEL_FILES = 256
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python crawler.py corpus output")
+    pages, links = crawl_to_disk(sys.argv[1], sys.argv[2])
+    print(f"Crawled {pages} pages with {links} links into {sys.argv[2]}.")
+
+
+def extract_links(path):
+    """
+    Return the set of link targets in the HTML file at `path`, reading
+    it in chunks rather than all at once.
+    """
+    links = set()
+    tail = ""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            text = tail + chunk
+            end = 0
+            for match in LINK.finditer(text):
+                links.add(match.group(1))
+                end = match.end()
+            tail = text[max(end, len(text) - OVERLAP):]
+    return links
+
+
+def html_files(directory):
+    """
+    Yield the names of the HTML files in `directory`.
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(".html") and entry.is_file():
+                yield entry.name
+
+
+def crawl_to_disk(directory, output, processes=None):
+    """
+    Extract the links of every HTML page in `directory` on a process pool
+    and write the link graph to disk as it goes:
+        `{output}.pages` holds one page name per line, line i being page i
+        `{output}.edges` holds (source, target) pairs of 32-bit page ids
+    Links to files outside the corpus and to the page itself are dropped.
+    Return the number of pages and links written.
+    """
+    ids = {}
+    is_page = array("b")
+    raw = f"{output}.edges.raw"
+
+    def intern(name):
+        i = ids.get(name)
+        if i is None:
+            i = ids[name] = len(ids)
+            is_page.append(0)
+        return i
+
+    # First pass: stream every page's links to disk under provisional
+    # ids, since a link may point at a page that is crawled later
+    with open(raw, "wb") as f, ProcessPoolExecutor(processes) as executor:
+        names = list(html_files(directory))
+        paths = (os.path.join(directory, name) for name in names)
+        for name, links in zip(names, executor.map(extract_links, paths,
+                                                   chunksize=FILES_PER_TASK)):
+            source = intern(name)
+            is_page[source] = 1
+            edges = array("i")
+            for link in links:
+                if link != name:
+                    edges.append(source)
+                    edges.append(intern(link))
+            edges.tofile(f)
+
+    # Second pass: renumber real pages densely and drop dangling links
+    dense = array("i", [-1]) * len(ids)
+    with open(f"{output}.pages", "w", encoding="utf-8") as f:
+        count = 0
+        for name, i in ids.items():
+            if is_page[i]:
+                dense[i] = count
+                count += 1
+                f.write(name + "\n")
+    links = 0
+    with open(raw, "rb") as source, open(f"{output}.edges", "wb") as target:
+        while True:
+            edges = array("i")
+            edges.frombytes(source.read(CHUNK_SIZE * edges.itemsize * 2))
+            if not edges:
+                break
+            kept = array("i")
+            for k in range(0, len(edges), 2):
+                u = dense[edges[k]]
+                v = dense[edges[k + 1]]
+                if v >= 0:
+                    kept.append(u)
+                    kept.append(v)
+            kept.tofile(target)
+            links += len(kept) // 2
+    os.remove(raw)
+    return count, links
+
+
+def crawl_cached(directory):
+    """
+    Return the same dictionary as `pagerank.crawl`, re-parsing only the
+    HTML files whose size or modification time changed since the last
+    call and reusing the cached links of the others.
+    """
+    corpus, _, _ = scan(directory)
+    return corpus
+
+
+def scan(directory, cache_name=CACHE):
+    """
+    Bring the link cache `cache_name` of `directory` up to date.
+    Return the corpus dictionary, the set of pages that were added,
+    modified or removed since the cache was last written, and the links
+    the cache held for those of them it knew, by page name.
+    """
+    path = os.path.join(directory, cache_name)
+    try:
+        with open(path, encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache.get("version") != CACHE_VERSION:
+            cache = None
+    except (OSError, ValueError):
+        cache = None
+    cached = cache["files"] if cache else {}
+
+    files = {}
+    stale = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".html") or not entry.is_file():
+                continue
+            stat = entry.stat()
+            old = cached.get(entry.name)
+            if old and old["size"] == stat.st_size and old["mtime"] == stat.st_mtime_ns:
+                files[entry.name] = old
+            else:
+                files[entry.name] = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+                stale.append(entry.name)
+
+    paths = [os.path.join(directory, name) for name in stale]
+    if len(paths) >= PARALLEL_FILES:
+        with ProcessPoolExecutor() as executor:
+            parsed = list(executor.map(extract_links, paths, chunksize=FILES_PER_TASK))
+    else:
+        parsed = [extract_links(p) for p in paths]
+    for name, links in zip(stale, parsed):
+        files[name]["links"] = sorted(links - {name})
+
+    changed = set(stale) | (set(cached) - set(files))
+    previous = {name: cached[name]["links"] for name in changed if name in cached}
+    if changed or cache is None:
+        try:
+            temporary = f"{path}.tmp"
+            # json.dumps uses the C encoder, json.dump does not
+            with open(temporary, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"version": CACHE_VERSION, "files": files}))
+            os.replace(temporary, path)
+        except OSError:
+            # Read-only corpus, parse again next time
+            pass
+
+    corpus = {
+        name: set(link for link in entry["links"] if link in files)
+        for name, entry in files.items()
+    }
+    return corpus, changed, previous
+
+
+def load_link_matrix(output):
+    """
+    Build a `LinkMatrix` from the files written by `crawl_to_disk`.
+    """
+    with open(f"{output}.pages", encoding="utf-8") as f:
+        pages = f.read().splitlines()
+    edges = array("i")
+    with open(f"{output}.edges", "rb") as f:
+        edges.frombytes(f.read())
+    return LinkMatrix.from_edges(pages, edges[0::2], edges[1::2])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import json
+import os
+import sys
+from collections import deque
+
+from crawler import scan
+from matrix import TOLERANCE, LinkMatrix, power_iteration, residual
+
+# Rank vector saved inside the corpus directory after each update, and
+# the link cache it was computed from, kept apart from the crawler's own
+# so that other crawls cannot hide edits from it
+RANKS = ".pagerank-ranks.json"
+LINKS = ".pagerank-ranks-links.json"
+STATE_VERSION = 2
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python incremental.py corpus")
+    ranks, info = incremental_pagerank(sys.argv[1], 0.85)
+    print(f"PageRank Results ({info['mode']}, {info['pushes']} pushes, "
+          f"L1 error <= {info['error_bound']:.2e})")
+    for page in sorted(ranks):
+        print(f"  {page}: {ranks[page]:.4f}")
+
+
+def incremental_pagerank(directory, damping_factor, tolerance=TOLERANCE):
+    """
+    Return PageRank values for the corpus in `directory`, reusing the
+    ranks saved there by the previous call, and save the new ones.
+
+    Whatever way they were computed, the ranks returned are within
+    `tolerance` of the exact PageRank vector in L1 norm. PageRank is the
+    fixed point of x = b + d * M x with M column-stochastic, so for any
+    vector x with residual r = b + d * M x - x,
+        ||x* - x||_1 <= ||r||_1 / (1 - d)
+    and info["error_bound"] reports that bound.
+
+    The pages whose files changed come from `crawler.scan`. If none did,
+    and the saved ranks are within `tolerance`, they are returned as
+    they are. If only some pages' links changed, the saved residual is
+    corrected for the columns of M that changed, and then only pages
+    reached from the edited ones get a push (see `push`), so the work
+    depends on the edit, not the corpus. If pages were added or removed,
+    or the saved state cannot be trusted, power iteration is
+    warm-started from the saved ranks.
+
+    Return the ranks and an info dictionary with the "mode" used
+    ("unchanged", "push", "warm" or "full"), the number of "pushes", and
+    the "error_bound".
+    """
+    d = float(damping_factor)
+    path = os.path.join(directory, RANKS)
+    saved = load_state(path)
+    if saved is not None and (saved.get("version") != STATE_VERSION or saved["damping"] != d):
+        saved = None
+    # The link cache must be the one the saved ranks were computed from
+    synced = saved is not None and saved["links"] == stamp(os.path.join(directory, LINKS))
+    corpus, changed, previous = scan(directory, LINKS)
+
+    # Saved ranks may have been computed to a looser tolerance
+    tight = saved is not None and saved["error_bound"] <= tolerance
+    if synced and tight and not changed:
+        ranks = dict(zip(saved["pages"], saved["ranks"]))
+        return ranks, {"mode": "unchanged", "pushes": 0, "error_bound": saved["error_bound"]}
+
+    pages = saved["pages"] if saved is not None else None
+    index = {page: i for i, page in enumerate(pages)} if synced else {}
+    if synced and all(page in index and page in corpus for page in changed):
+        ranks = saved["ranks"]
+        res = saved["residual"]
+        edits = {}
+        for page in changed:
+            old = set(link for link in previous.get(page, ()) if link in index)
+            if old != corpus[page]:
+                edits[index[page]] = ([index[v] for v in old], [index[v] for v in corpus[page]])
+
+        # Pages are pushed many times over, so translate their links once
+        translated = {}
+
+        def links(u):
+            if u not in translated:
+                translated[u] = [index[v] for v in corpus[pages[u]]]
+            return translated[u]
+
+        uniform, touched = correct_residual(edits, len(pages), d, ranks, res)
+        uniform += saved["uniform"]
+        seeds = touched if tight else None
+        pushes, uniform = push(links, len(pages), d, ranks, res, uniform, tolerance, seeds)
+        info = {"mode": "push" if edits else "unchanged", "pushes": pushes}
+    else:
+        matrix = LinkMatrix.from_corpus(corpus)
+        n = len(matrix)
+        start = None
+        info = {"mode": "full"}
+        if saved is not None:
+            # Keep the old ranks of surviving pages, new pages get 1/N
+            old = dict(zip(saved["pages"], saved["ranks"]))
+            start = [old.get(page, 1 / n) for page in matrix.pages]
+            total = sum(start)
+            start = [rank / total for rank in start]
+            info["mode"] = "warm"
+        ranks = power_iteration(matrix, d, tolerance * (1 - d) / 2, start=start)
+        res = residual(matrix, d, ranks)
+        info["pushes"], uniform = push(matrix.links, n, d, ranks, res, 0.0, tolerance)
+        pages = matrix.pages
+
+    info["error_bound"] = (sum(map(abs, res)) + len(pages) * abs(uniform)) / (1 - d)
+    save_state(path, {
+        "version": STATE_VERSION,
+        "damping": d,
+        "links": stamp(os.path.join(directory, LINKS)),
+        "pages": pages,
+        "ranks": ranks,
+        "residual": res,
+        "uniform": uniform,
+        "error_bound": info["error_bound"],
+    })
+    return dict(zip(pages, ranks)), info
+
+
+def correct_residual(edits, n, d, ranks, res):
+    """
+    Update the residual `res` in place for the pages in `edits`, a
+    dictionary from page number to its (old links, new links). Only the
+    targets of the edited pages are touched; the part of the change
+    spread over every page by pages that are or were dangling is
+    returned as a single number, along with the set of touched pages.
+    """
+    uniform = 0.0
+    touched = set()
+    for u, (old, new) in edits.items():
+        mass = d * ranks[u]
+        if old:
+            for v in old:
+                res[v] -= mass / len(old)
+        else:
+            uniform -= mass / n
+        if new:
+            for v in new:
+                res[v] += mass / len(new)
+        else:
+            uniform += mass / n
+        touched.update(old)
+        touched.update(new)
+    return uniform, touched
+
+
+def push(links, n, d, ranks, res, uniform, tolerance, seeds=None):
+    """
+    Gauss-Southwell push: while some page's residual r_v is too large,
+    move it into its rank (x_v += r_v) and spread d * r_v along its
+    column of M to the residuals of the pages `links(v)` returns.
+    Dangling pages spread to every page, which is kept apart in the
+    scalar `uniform`, so the full residual is res + uniform.
+
+    Only the pages in `seeds` (every page if None) and those pushes reach
+    are looked at; `uniform` is folded into `res` at O(N) cost only when
+    it grows large enough to matter. Stops once every |res_v| and
+    N * |uniform| are small enough that the error bound is at most
+    `tolerance`. Updates `ranks` and `res` in place and returns the
+    number of pushes and the new `uniform`.
+    """
+    threshold = tolerance * (1 - d) / (2 * n)
+    pushes = 0
+    if seeds is None:
+        seeds = range(n)
+    while True:
+        queue = deque(v for v in seeds if abs(res[v]) > threshold)
+        queued = set(queue)
+        while queue:
+            u = queue.popleft()
+            queued.discard(u)
+            r = res[u]
+            ranks[u] += r
+            res[u] = 0.0
+            pushes += 1
+            targets = links(u)
+            if not targets:
+                uniform += d * r / n
+                continue
+            share = d * r / len(targets)
+            for v in targets:
+                res[v] += share
+                if v not in queued and abs(res[v]) > threshold:
+                    queued.add(v)
+                    queue.append(v)
+        if abs(uniform) * n <= tolerance * (1 - d) / 2:
+            return pushes, uniform
+        for v in range(n):
+            res[v] += uniform
+        uniform = 0.0
+        seeds = range(n)
+
+
+def stamp(path):
+    """
+    Return the size and modification time of the file at `path`, or
+    None if there is none.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def load_state(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_state(path, state):
+    try:
+        temporary = f"{path}.tmp"
+        # json.dumps uses the C encoder, json.dump does not
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(json.dumps(state))
+        os.replace(temporary, path)
+    except OSError:
+        # Read-only corpus, start over next time
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+from array import array
+from typing import Dict, List
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Default L1 distance between successive rank vectors at which the
+# power iteration stops
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 1000
+
+
+class LinkMatrix():
+    """
+    Link graph of a corpus in compressed sparse row form.
+
+    Page `u` is named `pages[u]` and links to the pages
+    `targets[offsets[u]:offsets[u + 1]]`. The transposed graph is kept
+    the same way in `in_offsets` and `sources` so that a sweep can pull
+    each page's new rank from the pages linking to it.
+    """
+
+    def __init__(self, pages, offsets, targets):
+        self.pages = pages
+        self.offsets = offsets
+        self.targets = targets
+        n = len(pages)
+        self.out_degree = array("i", (offsets[u + 1] - offsets[u] for u in range(n)))
+        self.dangling = array("i", (u for u in range(n) if self.out_degree[u] == 0))
+
+        # Transpose by counting sort on link target
+        in_offsets = array("q", bytes(8 * (n + 1)))
+        for v in targets:
+            in_offsets[v + 1] += 1
+        for v in range(n):
+            in_offsets[v + 1] += in_offsets[v]
+        sources = array("i", bytes(4 * len(targets)))
+        position = array("q", in_offsets[:-1])
+        for u in range(n):
+            for k in range(offsets[u], offsets[u + 1]):
+                v = targets[k]
+                sources[position[v]] = u
+                position[v] += 1
+        self.in_offsets = in_offsets
+        self.sources = sources
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build the matrix of a `crawl` result, ignoring links to pages
+        outside the corpus.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        offsets = array("q", [0])
+        targets = array("i")
+        for page in pages:
+            targets.extend(sorted(index[link] for link in corpus[page] if link in index))
+            offsets.append(len(targets))
+        return cls(pages, offsets, targets)
+
+    @classmethod
+    def from_edges(cls, pages, sources, targets):
+        """
+        Build the matrix from parallel arrays of link sources and
+        targets, given as page numbers into `pages`.
+        """
+        n = len(pages)
+        offsets = array("q", bytes(8 * (n + 1)))
+        for u in sources:
+            offsets[u + 1] += 1
+        for u in range(n):
+            offsets[u + 1] += offsets[u]
+        grouped = array("i", bytes(4 * len(targets)))
+        position = array("q", offsets[:-1])
+        for u, v in zip(sources, targets):
+            grouped[position[u]] = v
+            position[u] += 1
+        for u in range(n):
+            row = sorted(grouped[offsets[u]:offsets[u + 1]])
+            grouped[offsets[u]:offsets[u + 1]] = array("i", row)
+        return cls(list(pages), offsets, grouped)
+
+    def to_corpus(self):
+        """
+        Return the matrix as a `crawl`-style dictionary of link sets.
+        """
+        return {
+            page: set(self.pages[v] for v in self.links(u))
+            for u, page in enumerate(self.pages)
+        }
+
+    def __len__(self):
+        return len(self.pages)
+
+    def links(self, u):
+        return self.targets[self.offsets[u]:self.offsets[u + 1]]
+
+    def to_dict(self, ranks) -> Dict[str, float]:
+        return {page: float(ranks[i]) for i, page in enumerate(self.pages)}
+
+
+def power_iteration(matrix, damping_factor, tolerance=TOLERANCE,
+                    max_iterations=MAX_ITERATIONS, start=None, teleport=None) -> List[float]:
+    """
+    Return the PageRank vector of `matrix`, iterating
+        r' = (1 - d + d * (sum of dangling ranks)) * t + d * P^T r
+    from `start` (the uniform vector by default) until the L1 change
+    is below `tolerance`. The teleport distribution `t` is uniform unless
+    `teleport` gives one probability per page. Dangling pages jump the
+    same way, applied as a single rank-one correction rather than as
+    N links.
+    """
+    if np is not None:
+        return numpy_power_iteration(matrix, damping_factor, tolerance, max_iterations,
+                                     start, teleport)
+    n = len(matrix)
+    d = float(damping_factor)
+    out_degree = matrix.out_degree
+    in_offsets = matrix.in_offsets
+    sources = matrix.sources
+    ranks = list(start) if start is not None else [1 / n] * n
+    if teleport is None:
+        teleport = [1 / n] * n
+    for _ in range(max_iterations):
+        share = [
+            ranks[u] / out_degree[u] if out_degree[u] else 0.0
+            for u in range(n)
+        ]
+        jump = 1 - d + d * sum(ranks[u] for u in matrix.dangling)
+        new_ranks = [
+            jump * teleport[v]
+            + d * sum(share[sources[k]] for k in range(in_offsets[v], in_offsets[v + 1]))
+            for v in range(n)
+        ]
+        change = sum(abs(new_ranks[v] - ranks[v]) for v in range(n))
+        ranks = new_ranks
+        if change < tolerance:
+            break
+    return ranks
+
+
+def numpy_power_iteration(matrix, damping_factor, tolerance, max_iterations, start=None,
+                          teleport=None):
+    """
+    Same as `power_iteration`, vectorized with NumPy: each sweep is one
+    weighted bincount over the link array.
+    """
+    n = len(matrix)
+    d = float(damping_factor)
+    out_degree = np.frombuffer(matrix.out_degree, dtype=np.int32)
+    targets = np.frombuffer(matrix.targets, dtype=np.int32)
+    # Source page of every link, in the same order as targets
+    link_sources = np.repeat(np.arange(n), out_degree)
+    dangling = np.frombuffer(matrix.dangling, dtype=np.int32)
+    inverse = np.zeros(n)
+    inverse[out_degree > 0] = 1 / out_degree[out_degree > 0]
+    ranks = np.array(start, dtype=float) if start is not None else np.full(n, 1 / n)
+    teleport = np.array(teleport, dtype=float) if teleport is not None else np.full(n, 1 / n)
+    for _ in range(max_iterations):
+        share = ranks * inverse
+        base = (1 - d + d * ranks[dangling].sum()) * teleport
+        new_ranks = base + d * np.bincount(targets, weights=share[link_sources], minlength=n)
+        change = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if change < tolerance:
+            break
+    return ranks.tolist()
+
+
+def residual(matrix, damping_factor, ranks) -> List[float]:
+    """
+    Return the residual `b + d * M r - r` of a rank vector, where the
+    PageRank vector is the fixed point of r = b + d * M r. Its L1 norm
+    divided by (1 - d) bounds the L1 error of `ranks`.
+    """
+    n = len(matrix)
+    d = float(damping_factor)
+    out_degree = matrix.out_degree
+    in_offsets = matrix.in_offsets
+    sources = matrix.sources
+    share = [ranks[u] / out_degree[u] if out_degree[u] else 0.0 for u in range(n)]
+    base = (1 - d) / n + d * sum(ranks[u] for u in matrix.dangling) / n
+    return [
+        base + d * sum(share[sources[k]] for k in range(in_offsets[v], in_offsets[v + 1]))
+        - ranks[v]
+        for v in range(n)
+    ]
@@ -4,6 +4,10 @@ import re
 import sys
 from typing import Dict
 
+from crawler import crawl_cached
+from matrix import TOLERANCE, LinkMatrix, power_iteration
+from sampling import sample, sample_batched, sample_parallel
+
 DAMPING = 0.85
 SAMPLES = 10000
 
@@ -11,12 +15,12 @@ SAMPLES = 10000
 def main():
     if len(sys.argv) != 2:
         sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
+    corpus = crawl_cached(sys.argv[1])
+    ranks = fast_sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+    ranks = matrix_pagerank(corpus, DAMPING)
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
@@ -124,5 +128,49 @@ def iterate_pagerank(corpus, damping_factor):
     # raise NotImplementedError
 
 
+def matrix_pagerank(corpus, damping_factor, tolerance=TOLERANCE) -> Dict[str, float]:
+    """
+    Return the same PageRank values as `iterate_pagerank`, computed by
+    power iteration over a sparse link matrix built once from the corpus,
+    so each sweep costs O(pages + links) instead of O(pages^2).
+
+    Iterates until the L1 change between sweeps is below `tolerance`.
+    """
+    matrix = LinkMatrix.from_corpus(corpus)
+    return matrix.to_dict(power_iteration(matrix, damping_factor, tolerance))
+
+
+def fast_sample_pagerank(corpus, damping_factor, n, batched=False) -> Dict[str, float]:
+    """
+    Return the same estimate as `sample_pagerank`, but sample each step
+    in O(1) from precomputed link arrays instead of building the full
+    transition model. With `batched`, many independent walkers are
+    advanced at once with NumPy.
+    """
+    matrix = LinkMatrix.from_corpus(corpus)
+    if batched:
+        counts = sample_batched(matrix, damping_factor, n)
+    else:
+        counts = sample(matrix, damping_factor, n)
+    return matrix.to_dict([count / n for count in counts])
+
+
+def parallel_sample_pagerank(corpus, damping_factor, n, processes=None, seed=None):
+    """
+    Estimate PageRank by sampling `n` pages split over independently
+    seeded chains on a process pool.
+
+    Return two dictionaries: the estimated PageRank of each page, and
+    the (low, high) bounds of its 95% confidence interval.
+    """
+    matrix = LinkMatrix.from_corpus(corpus)
+    ranks, errors = sample_parallel(matrix, damping_factor, n, processes, seed=seed)
+    intervals = {
+        page: (ranks[i] - errors[i], ranks[i] + errors[i])
+        for i, page in enumerate(matrix.pages)
+    }
+    return matrix.to_dict(ranks), intervals
+
+
 if __name__ == "__main__":
     main()
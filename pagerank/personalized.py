@@ -0,0 +1,109 @@
+import heapq
+import sys
+from collections import deque
+from operator import itemgetter
+
+from crawler import crawl_cached
+from matrix import TOLERANCE, LinkMatrix, power_iteration
+
+DAMPING = 0.85
+TOP = 20
+
+# Residual per out-link below which `local_push` stops pushing a page
+EPSILON = 1e-6
+
+
+def main():
+    if len(sys.argv) < 3:
+        sys.exit("Usage: python personalized.py corpus seed [seed ...]")
+    matrix = LinkMatrix.from_corpus(crawl_cached(sys.argv[1]))
+    ranks, error = local_push(matrix, DAMPING, sys.argv[2:])
+    print(f"Pages closest to {', '.join(sys.argv[2:])} (L1 error <= {error:.2e})")
+    for page, rank in top_k(ranks, TOP):
+        print(f"  {page}: {rank:.4f}")
+
+
+def seed_weights(matrix, seeds):
+    """
+    Return {page number: probability} for `seeds`, either an iterable of
+    page names weighted equally or a dictionary of page names to weights.
+    """
+    if not isinstance(seeds, dict):
+        seeds = dict.fromkeys(seeds, 1)
+    index = {page: i for i, page in enumerate(matrix.pages)}
+    unknown = [page for page in seeds if page not in index]
+    if unknown:
+        raise ValueError(f"unknown seed pages: {', '.join(sorted(unknown))}")
+    total = sum(seeds.values())
+    if not seeds or total <= 0:
+        raise ValueError("seed weights must add up to a positive number")
+    return {index[page]: weight / total for page, weight in seeds.items()}
+
+
+def personalized_pagerank(matrix, damping_factor, seeds, tolerance=TOLERANCE):
+    """
+    Return PageRank values for every page of `matrix` when the random
+    surfer teleports to the `seeds` (see `seed_weights`) instead of to
+    a uniformly random page. Dangling pages also jump to the seeds.
+    """
+    teleport = [0.0] * len(matrix)
+    for u, weight in seed_weights(matrix, seeds).items():
+        teleport[u] = weight
+    ranks = power_iteration(matrix, damping_factor, tolerance, teleport=teleport)
+    return matrix.to_dict(ranks)
+
+
+def local_push(matrix, damping_factor, seeds, epsilon=EPSILON):
+    """
+    Approximate `personalized_pagerank` by pushing probability out from
+    the seeds (Andersen, Chung and Lang), touching only pages near them.
+
+    Every page u keeps an estimate p_u and a residual r_u, starting with
+    all of the mass in the residuals of the seeds. A push keeps 1 - d of
+    r_u in p_u and passes d * r_u on through u's links (to the seeds if u
+    has none). Pages are pushed until r_u < epsilon * out-degree(u) for
+    all of them, which takes O(1 / (epsilon * (1 - d))) work whatever the
+    size of the corpus.
+
+    Return (ranks, error): the nonzero estimates, by page name, and the
+    mass left in the residuals, which bounds their L1 error.
+    """
+    d = float(damping_factor)
+    teleport = seed_weights(matrix, seeds)
+    out_degree = matrix.out_degree
+    estimates = {}
+    residuals = dict(teleport)
+    queue = deque(residuals)
+    queued = set(queue)
+    while queue:
+        u = queue.popleft()
+        queued.discard(u)
+        r = residuals[u]
+        degree = out_degree[u]
+        if r < epsilon * max(degree, 1):
+            continue
+        estimates[u] = estimates.get(u, 0.0) + (1 - d) * r
+        residuals[u] = 0.0
+        if degree:
+            targets = ((v, d * r / degree) for v in matrix.links(u))
+        else:
+            targets = ((v, d * r * weight) for v, weight in teleport.items())
+        for v, share in targets:
+            residuals[v] = residuals.get(v, 0.0) + share
+            if v not in queued and residuals[v] >= epsilon * max(out_degree[v], 1):
+                queued.add(v)
+                queue.append(v)
+    ranks = {matrix.pages[u]: rank for u, rank in estimates.items()}
+    return ranks, sum(residuals.values())
+
+
+def top_k(ranks, k=TOP):
+    """
+    Return the `k` highest-ranked (page, rank) pairs, best first, using a
+    heap of size `k` instead of sorting every page.
+    """
+    return heapq.nlargest(k, ranks.items(), key=itemgetter(1))
+
+
+if __name__ == "__main__":
+    main()
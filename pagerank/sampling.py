@@ -0,0 +1,159 @@
+import math
+import multiprocessing
+import os
+import random
+from array import array
+
+from matrix import np
+
+# Walkers advanced together by the batched sampler, and the fewest
+# counted steps each of them takes, so that short runs use fewer walkers
+WALKERS = 10000
+MIN_STEPS = 100
+
+# Weight the batched sampler's uniformly random starting pages may keep
+# in the distribution of its walkers once they start being counted
+BURN_IN = 1e-3
+
+# Independent chains per process for the parallel sampler, and the
+# normal quantile used for its confidence intervals (95%)
+CHAINS_PER_PROCESS = 4
+Z = 1.96
+
+# Link matrix and damping factor of the parent, set in each pool worker
+worker_matrix = None
+worker_damping = None
+
+
+def sample(matrix, damping_factor, n, rng=random):
+    """
+    Random-surf `matrix` for `n` pages, starting on a random page, and
+    return an array counting the visits to each page.
+
+    Each step is O(1): with probability `damping_factor` follow a random
+    link of the current page (looked up in its CSR row), otherwise, or
+    if the page has no links, jump to a uniformly random page.
+    """
+    size = len(matrix)
+    counts = array("q", bytes(8 * size))
+    offsets = matrix.offsets
+    targets = matrix.targets
+    out_degree = matrix.out_degree
+    uniform = rng.random
+    d = float(damping_factor)
+    page = int(uniform() * size)
+    for _ in range(n):
+        counts[page] += 1
+        degree = out_degree[page]
+        if degree and uniform() < d:
+            page = targets[offsets[page] + int(uniform() * degree)]
+        else:
+            page = int(uniform() * size)
+    return counts
+
+
+def sample_batched(matrix, damping_factor, n, walkers=WALKERS, seed=None):
+    """
+    Same as `sample`, but advances up to `walkers` independent surfers
+    at once with NumPy, each starting on a random page, until `n` pages
+    have been visited in total. Falls back to `sample` without NumPy.
+
+    Every walker takes at least MIN_STEPS counted steps, and first a
+    burn-in of log(BURN_IN) / log(d) uncounted ones: after k steps only
+    about d^k of its mass still follows the uniform start, so counting
+    from the start would bias short runs towards equal ranks.
+    """
+    if np is None:
+        return sample(matrix, damping_factor, n, random.Random(seed))
+    size = len(matrix)
+    rng = np.random.default_rng(seed)
+    offsets = np.frombuffer(matrix.offsets, dtype=np.int64)
+    targets = np.frombuffer(matrix.targets, dtype=np.int32)
+    out_degree = np.frombuffer(matrix.out_degree, dtype=np.int32)
+    counts = np.zeros(size, dtype=np.int64)
+    d = float(damping_factor)
+    burn_in = math.ceil(math.log(BURN_IN) / math.log(d)) if 0 < d < 1 else 0
+    # Visited pages are counted in bulk once there are about `size` of them
+    visited = []
+    pending = 0
+    pages = rng.integers(size, size=min(walkers, max(1, n // MIN_STEPS)))
+    for _ in range(burn_in):
+        pages = step(pages, d, rng, offsets, targets, out_degree)
+    remaining = n
+    while remaining > 0:
+        if remaining < len(pages):
+            pages = pages[:remaining]
+        visited.append(pages)
+        pending += len(pages)
+        remaining -= len(pages)
+        if pending >= size or remaining == 0:
+            counts += np.bincount(np.concatenate(visited), minlength=size)
+            visited = []
+            pending = 0
+        pages = step(pages, d, rng, offsets, targets, out_degree)
+    return array("q", counts.tolist())
+
+
+def step(pages, d, rng, offsets, targets, out_degree):
+    """
+    Return the pages the walkers on `pages` move to in one random-surfer
+    step, for `sample_batched`.
+    """
+    size = len(out_degree)
+    degree = out_degree[pages]
+    follow = (degree > 0) & (rng.random(len(pages)) < d)
+    jump = rng.integers(size, size=len(pages))
+    link = offsets[pages] + (rng.random(len(pages)) * degree).astype(np.int64)
+    if len(targets):
+        return np.where(follow, targets[np.where(follow, link, 0)], jump)
+    return jump
+
+
+def sample_parallel(matrix, damping_factor, n, processes=None, chains=None, seed=None):
+    """
+    Split `n` samples over `chains` independent random surfers with
+    their own seeded RNG streams, run them on a pool of `processes`,
+    and merge their visit counts.
+
+    Return (ranks, errors): the estimated PageRank of each page, and the
+    half-width of its 95% confidence interval, estimated from how much
+    the per-chain estimates spread around their mean.
+    """
+    processes = processes or os.cpu_count() or 1
+    chains = max(min(chains or processes * CHAINS_PER_PROCESS, n), 1)
+    master = random.Random(seed)
+    tasks = [
+        (master.getrandbits(64), n // chains + (1 if i < n % chains else 0))
+        for i in range(chains)
+    ]
+    with multiprocessing.Pool(processes, init_worker, (matrix, damping_factor)) as pool:
+        results = pool.map(run_chain, tasks)
+
+    size = len(matrix)
+    totals = [0] * size
+    for counts in results:
+        for page in range(size):
+            totals[page] += counts[page]
+    ranks = [total / n for total in totals]
+    errors = [0.0] * size
+    if chains > 1:
+        for page in range(size):
+            estimates = [counts[page] / length for counts, (_, length) in zip(results, tasks)]
+            mean = sum(estimates) / chains
+            variance = sum((e - mean) ** 2 for e in estimates) / (chains - 1)
+            errors[page] = Z * math.sqrt(variance / chains)
+    return ranks, errors
+
+
+def init_worker(matrix, damping_factor):
+    global worker_matrix, worker_damping
+    worker_matrix = matrix
+    worker_damping = damping_factor
+
+
+def run_chain(task):
+    """
+    Run one seeded chain of `sample` in a pool worker.
+    """
+    seed, length = task
+    return sample(worker_matrix, worker_damping, length, random.Random(seed))
@@ -0,0 +1,25 @@
+import os
+import unittest
+
+from matrix import LinkMatrix, power_iteration
+from pagerank import DAMPING, SAMPLES, crawl
+from sampling import sample_batched
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus1")
+
+
+class BatchedSamplingTest(unittest.TestCase):
+
+    def test_converges_at_default_sample_count(self):
+        # Uniform ranks, which counting every walker's start gave, are
+        # off by about 0.29 on this corpus
+        matrix = LinkMatrix.from_corpus(crawl(CORPUS))
+        ranks = power_iteration(matrix, DAMPING)
+        for seed in range(3):
+            counts = sample_batched(matrix, DAMPING, SAMPLES, seed=seed)
+            error = sum(abs(count / SAMPLES - rank) for count, rank in zip(counts, ranks))
+            self.assertLess(error, 0.06)
+
+
+if __name__ == "__main__":
+    unittest.main()